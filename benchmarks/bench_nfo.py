@@ -0,0 +1,137 @@
+# bench_nfo.py
+# -*- coding: utf-8 -*-
+"""
+Confronto µs/file: il vecchio parser (ET.parse + findall sull'albero intero) contro
+NFOParser (lettura selettiva in un solo passaggio) su .nfo sintetici, più una serie di .nfo
+malformati che Kodi accetta (BOM, spazi iniziali, URL dello scraper in coda, '&' non
+escapato, file troncato, Windows-1252, <fileinfo> enorme).
+
+    python benchmarks/bench_nfo.py -n 2000 --repeat 3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from nfo_parser import NFOParser  # noqa: E402
+from perfstats import timed  # noqa: E402
+from synth_library import make_nfo  # noqa: E402
+
+_EMPTY = ('', '', '', '', '', '', '', '')
+
+
+@timed('bench.legacy_parse')
+def legacy_parse(nfo_path):
+    """Il parser precedente (con lo stesso timer), per confronto di velocità e di risultato."""
+    try:
+        root = ET.parse(nfo_path).getroot()
+    except Exception:
+        return _EMPTY
+    actors = []
+    for a in root.findall('actor'):
+        name = a.findtext('name') or a.findtext('actor') or a.text
+        if name and name.strip():
+            actors.append(name.strip())
+    for a in root.findall('actors'):
+        actors += [c.text.strip() for c in a if c.text and c.text.strip()]
+    poster = ''
+    for tag in ('thumb', 'poster', 'fanart'):
+        v = root.findtext(tag)
+        if v and v.strip():
+            poster = v.strip()
+            break
+    if not poster and root.find('fanart') is not None:
+        poster = (root.find('fanart').findtext('thumb') or root.find('fanart').findtext('poster') or '').strip()
+    return ('|'.join(g.text.strip() for g in root.findall('genre') if g.text),
+            root.findtext('year', '').strip(),
+            '|'.join(d.text.strip() for d in root.findall('director') if d.text),
+            root.findtext('plot', '').strip(), '|'.join(actors),
+            (root.findtext('runtime', '') or root.findtext('duration', '') or '').strip(),
+            (root.findtext('rating', '') or '').strip(), poster)
+
+
+def make_corpus(folder, n, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for i in range(n):
+        path = os.path.join(folder, f'{i}.nfo')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(make_nfo(rng, f'Film {i}', rng.randint(1930, 2024), ['Drama', 'Noir'],
+                             f'http://posters.invalid/{i}.jpg'))
+        paths.append(path)
+    return paths
+
+
+def make_malformed(folder, seed=0):
+    """Varianti difettose dello stesso .nfo; ritorna {nome: percorso}."""
+    rng = random.Random(seed)
+    text = make_nfo(rng, 'Tom e Jerry', 1999, ['Animazione'], 'http://posters.invalid/tom.jpg')
+    body = text.split('\n', 1)[1]
+    blob = '<fileinfo><streamdetails>' + ''.join(
+        f'<audio><codec>ac3</codec><language>l{k}</language><channels>6</channels></audio>'
+        for k in range(2000)) + '</streamdetails></fileinfo>'
+    variants = {
+        'bom': b'\xef\xbb\xbf' + text.encode('utf-8'),
+        'bom_whitespace': b'\xef\xbb\xbf\n\n  ' + text.encode('utf-8'),
+        'utf16': text.replace('UTF-8', 'UTF-16').encode('utf-16'),
+        'scraper_url': (text + 'https://www.themoviedb.org/movie/1234\n').encode('utf-8'),
+        'bare_amp': text.replace('Tom e Jerry', 'Tom & Jerry').encode('utf-8'),
+        'cp1252': body.replace('Tom e Jerry', 'Tom è Jerry – ok').encode('cp1252'),
+        'truncated': text.encode('utf-8')[:len(text) * 2 // 3],
+        'no_declaration': body.encode('utf-8'),
+        'huge_fileinfo': text.replace('</movie>', blob + '</movie>').encode('utf-8'),
+        'not_xml': b'https://www.themoviedb.org/movie/1234\n',
+    }
+    paths = {}
+    for name, data in variants.items():
+        paths[name] = os.path.join(folder, f'{name}.nfo')
+        with open(paths[name], 'wb') as f:
+            f.write(data)
+    return paths
+
+
+def bench(parse, paths, repeat):
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for p in paths:
+            parse(p)
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs) / len(paths) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('-n', type=int, default=2000, help='numero di .nfo')
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    parser = NFOParser()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_corpus(tmp, args.n)
+        mismatches = sum(legacy_parse(p) != parser.parse_video_info(p) for p in paths)
+        legacy = bench(legacy_parse, paths, args.repeat)
+        current = bench(parser.parse_video_info, paths, args.repeat)
+        print(f'{"ET.parse + findall":<24} {legacy:>8.1f} µs/file')
+        print(f'{"NFOParser":<24} {current:>8.1f} µs/file  x{legacy / current:.2f}  '
+              f'({mismatches} risultati diversi su {len(paths)})')
+
+        print()
+        for name, path in make_malformed(tmp).items():
+            old = legacy_parse(path)
+            new = parser.parse_video_info(path)
+            print(f'{name:<16} vecchio {"ok" if old != _EMPTY else "--":<3} '
+                  f'{bench(legacy_parse, [path], args.repeat):>9.1f} µs   '
+                  f'nuovo {"ok" if new != _EMPTY else "--":<3} {bench(parser.parse_video_info, [path], args.repeat):>9.1f} µs'
+                  f'  attori={len(new[4].split("|")) if new[4] else 0}')
+
+
+if __name__ == '__main__':
+    main()
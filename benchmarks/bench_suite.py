@@ -0,0 +1,228 @@
+# bench_suite.py
+# -*- coding: utf-8 -*-
+"""
+Suite di benchmark dei percorsi caldi (fasi della scansione, query con vari filtri, faccette,
+Gestione DB, export, playlist) su una libreria sintetica. I risultati escono in JSON per
+confrontare versioni diverse; con --compare segnala i rallentamenti rispetto a un'esecuzione
+precedente ed esce con codice 1.
+
+    python benchmarks/bench_suite.py -n 5000 --output base.json
+    python benchmarks/bench_suite.py -n 5000 --compare base.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from db_manager import DBManager, FACET_GENRE  # noqa: E402
+from nfo_parser import NFOParser  # noqa: E402
+from scanner import LibraryScanner, SCAN_WORKERS  # noqa: E402
+from playlist import generate_playlist  # noqa: E402
+from synth_library import make_library  # noqa: E402
+
+# rallentamento oltre il quale --compare segnala una regressione
+REGRESSION_TOLERANCE = 0.25
+# differenze sotto questa soglia sono rumore (secondi)
+NOISE_SECONDS = 0.002
+
+
+def timed(fn, repeat, items=None):
+    """Esegue `fn` `repeat` volte; ritorna mediana/minimo in secondi (e il numero di elementi)."""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t0)
+    out = {'median': statistics.median(runs), 'min': min(runs), 'runs': repeat}
+    count = items if items is not None else (len(result) if isinstance(result, (list, tuple)) else None)
+    if count is not None:
+        out['items'] = count
+    return out
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def bench_scan(results, library, tmp, repeat, workers):
+    scanner = LibraryScanner(None, workers=workers)
+    entries = []
+
+    def walk():
+        entries[:] = scanner._iter_videos(library)
+        return entries
+    results['scan.walk'] = timed(walk, repeat)
+
+    parser = NFOParser()
+    with_nfo = [e for e in entries if e['nfo_mtime'] is not None]
+    parsed = []
+
+    def parse():
+        parsed[:] = [parser.parse_video_info(e['nfo_path']) for e in with_nfo]
+        return parsed
+    results['scan.parse'] = timed(parse, repeat)
+
+    fields = dict(zip((e['path'] for e in with_nfo), parsed))
+    empty = ('', '', '', '', '', '', '', '')
+    records = []
+    for e in entries:
+        genres, year, directors, plot, actors, duration, rating, poster = fields.get(e['path'], empty)
+        records.append({'path': e['path'], 'mtime': e['mtime'], 'genres': genres, 'year': year,
+                        'directors': directors, 'plot': plot, 'actors': actors, 'duration': duration,
+                        'rating': rating, 'poster': poster or e['poster'], 'size': e['size'],
+                        'nfo_mtime': e['nfo_mtime']})
+    runs = iter(range(repeat * 2))
+
+    def write():
+        db = DBManager(os.path.join(tmp, f'write{next(runs)}.db'))
+        try:
+            return db.upsert_videos(records)
+        finally:
+            db.close()
+    results['scan.write'] = timed(write, repeat, items=len(records))
+
+    def full():
+        db = DBManager(os.path.join(tmp, f'full{next(runs)}.db'))
+        try:
+            return LibraryScanner(db, workers=workers).scan(library, incremental=False)['written']
+        finally:
+            db.close()
+    results['scan.full'] = timed(full, repeat, items=len(records))
+
+
+def bench_db(results, db, library, tmp, repeat, workers):
+    scanner = LibraryScanner(db, workers=workers)
+    scanner.scan(library, incremental=False)
+    results['scan.incremental'] = timed(lambda: scanner.scan(library)['discovered'], repeat,
+                                        items=db.count_videos())
+
+    # valori reali presi dal catalogo, così i filtri trovano sempre qualcosa
+    genre = db.get_all_genres()[0]
+    year = db.get_all_years()[len(db.get_all_years()) // 2]
+    director = db.get_all_directors()[0]
+    actor = db.get_all_actors()[0]
+    word = db.conn.execute("SELECT plot FROM videos WHERE plot != '' LIMIT 1").fetchone()[0].split()[0]
+    mixes = {
+        'all': {},
+        'genre': {'genres': [genre]},
+        'year': {'years': [year]},
+        'director': {'directors': [director]},
+        'actor': {'actors': [actor]},
+        'search': {'search': word},
+        'genre_year': {'genres': [genre], 'years': [year]},
+        'mixed': {'genres': [genre], 'actors': [actor], 'search': word},
+    }
+
+    def uncached(filters):
+        db.query_cache.clear()
+        return db.query_videos(**filters)
+
+    for name, filters in mixes.items():
+        results[f'query.{name}'] = timed(lambda: uncached(filters), repeat)
+    # ritorno su una selezione già vista: id dalla cache, solo la lettura delle righe
+    results['query.cached'] = timed(lambda: db.query_videos(**mixes['genre_year']), repeat)
+
+    results['facets.genres'] = timed(db.get_all_genres, repeat)
+    results['facets.years'] = timed(db.get_all_years, repeat)
+    results['facets.directors'] = timed(db.get_all_directors, repeat)
+    results['facets.actors'] = timed(db.get_all_actors, repeat)
+    results['facets.counts'] = timed(lambda: db.facet_counts(FACET_GENRE, years=[year]), repeat)
+
+    results['dbm.fetch_all'] = timed(db.fetch_all, repeat)
+    results['dbm.fetch_page'] = timed(lambda: db.fetch_page('rating', descending=True), repeat)
+
+    results['export.csv'] = timed(lambda: db.export_videos(os.path.join(tmp, 'export.csv')), repeat,
+                                  items=db.count_videos())
+    results['export.jsonl_gz'] = timed(lambda: db.export_videos(os.path.join(tmp, 'export.jsonl.gz')), repeat,
+                                       items=db.count_videos())
+
+    results['playlist.count'] = timed(lambda: generate_playlist(db, count=20, recent_days=0), repeat)
+    results['playlist.budget_weighted'] = timed(
+        lambda: generate_playlist(db, budget_seconds=3 * 3600, weight_by_rating=True, recent_days=0,
+                                  max_per_director=1), repeat)
+
+
+def run_suite(library, repeat, workers):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_scan(results, library, tmp, repeat, workers)
+        db = DBManager(os.path.join(tmp, 'bench.db'))
+        try:
+            bench_db(results, db, library, tmp, repeat, workers)
+        finally:
+            db.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Stampa il confronto su stderr e ritorna i nomi dei benchmark rallentati."""
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        ratio = res['median'] / base['median'] if base['median'] else float('inf')
+        slower = ratio > 1 + tolerance and res['median'] - base['median'] > NOISE_SECONDS
+        if slower:
+            regressions.append(name)
+        print(f"{name:<26} {base['median'] * 1000:>10.2f} ms -> {res['median'] * 1000:>10.2f} ms  "
+              f"x{ratio:.2f}{'  REGRESSIONE' if slower else ''}", file=sys.stderr)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('-n', type=int, default=2000, help='video della libreria sintetica')
+    ap.add_argument('--library', help='usa una libreria esistente invece di generarne una')
+    ap.add_argument('--repeat', type=int, default=3, help='ripetizioni per benchmark (si riporta la mediana)')
+    ap.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--output', help='file JSON dei risultati (default: stdout)')
+    ap.add_argument('--compare', help='JSON di un\'esecuzione precedente da confrontare')
+    ap.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = ap.parse_args()
+
+    meta = {'revision': _git_revision(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'repeat': args.repeat, 'workers': args.workers}
+    with tempfile.TemporaryDirectory() as tmp:
+        library = args.library
+        if library is None:
+            library = os.path.join(tmp, 'library')
+            t0 = time.perf_counter()
+            make_library(library, args.n, seed=args.seed)
+            meta['generate_seconds'] = time.perf_counter() - t0
+        results = run_suite(library, args.repeat, args.workers)
+    meta['videos'] = results['scan.walk']['items']
+
+    report = json.dumps({'meta': meta, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
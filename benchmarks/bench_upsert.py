@@ -0,0 +1,66 @@
+# bench_upsert.py
+# -*- coding: utf-8 -*-
+"""
+Confronto righe/secondo: scrittura riga per riga (INSERT OR REPLACE + commit per riga,
+il vecchio percorso di scansione) contro DBManager.upsert_videos (lotti in transazione).
+
+    python benchmarks/bench_upsert.py -n 5000 --batch-size 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_manager import DBManager  # noqa: E402
+
+
+def make_records(n):
+    for i in range(n):
+        yield {'path': f'/bench/lib/dir{i % 100}/Movie {i}.mkv', 'mtime': 1700000000.0 + i,
+               'genres': 'Drama|Thriller', 'year': str(1950 + i % 70), 'directors': f'Director {i % 500}',
+               'plot': 'Lorem ipsum dolor sit amet. ' * 10, 'actors': '|'.join(f'Actor {i % 900 + k}' for k in range(5)),
+               'duration': str(80 + i % 70), 'rating': f'{5 + (i % 50) / 10:.1f}', 'poster': '',
+               'size': 1000000 + i, 'nfo_mtime': 1700000000.0 + i}
+
+
+def bench_legacy(db, records):
+    cur = db.conn.cursor()
+    t0 = time.perf_counter()
+    for r in records:
+        cur.execute('''INSERT OR REPLACE INTO videos(path, mtime, genres, year, directors, plot, actors, duration, rating, poster)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (r['path'], r['mtime'], r['genres'], r['year'], r['directors'], r['plot'],
+                     r['actors'], r['duration'], r['rating'], r['poster']))
+        db.conn.commit()
+    return time.perf_counter() - t0
+
+
+def bench_upsert(db, records, batch_size):
+    t0 = time.perf_counter()
+    db.upsert_videos(records, batch_size=batch_size)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('-n', type=int, default=5000, help='numero di righe')
+    ap.add_argument('--batch-size', type=int, default=500)
+    args = ap.parse_args()
+
+    records = list(make_records(args.n))
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, run in (('per-row INSERT OR REPLACE', lambda db: bench_legacy(db, records)),
+                           (f'upsert_videos (batch {args.batch_size})',
+                            lambda db: bench_upsert(db, records, args.batch_size))):
+            for phase in ('insert', 'update'):
+                db_path = os.path.join(tmp, f'{label.split()[0]}.db')
+                db = DBManager(db_path)
+                elapsed = run(db)
+                db.close()
+                print(f'{label:<32} {phase:<7} {args.n / elapsed:>12,.0f} rows/s  ({elapsed:.3f}s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# check_migrations.py
+# -*- coding: utf-8 -*-
+"""
+Verifica delle migrazioni dello schema: crea un DB con lo schema originale (tabella `videos`
+senza user_version) pieno di righe, lo apre con DBManager e controlla versione, righe,
+indice full-text, faccette e colonne ricavate. Esce con codice 1 al primo problema.
+
+    python benchmarks/check_migrations.py -n 2000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+from db_manager import DBManager, SCHEMA_VERSION  # noqa: E402
+from synth_library import GENRES, WORDS  # noqa: E402
+
+# schema della prima versione dell'applicazione (prima di ogni migrazione)
+BASELINE_SCHEMA = '''
+    CREATE TABLE videos (
+        id INTEGER PRIMARY KEY,
+        path TEXT UNIQUE,
+        mtime REAL,
+        genres TEXT,
+        year TEXT,
+        directors TEXT,
+        plot TEXT,
+        actors TEXT,
+        duration TEXT,
+        rating TEXT,
+        poster TEXT
+    );
+    CREATE INDEX idx_videos_path ON videos(path);
+    CREATE INDEX idx_videos_year ON videos(year);
+    CREATE INDEX idx_videos_directors ON videos(directors);
+'''
+
+
+def make_baseline_db(path, n, seed=0):
+    """DB con lo schema originale e `n` righe; generi e attori anche nel vecchio formato con virgole."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    rows = []
+    for i in range(n):
+        sep = ', ' if i % 3 == 0 else '|'
+        rows.append((f'/media/libreria/{rng.choice(GENRES)}/Film {rng.choice(WORDS)} {i}.mkv', 1.0,
+                     sep.join(rng.sample(GENRES, 2)), str(rng.randint(1930, 2024)), f'Regista {rng.randint(1, 300)}',
+                     ' '.join(rng.choice(WORDS) for _ in range(20)),
+                     sep.join(f'Attore {rng.randint(1, 2000)}' for _ in range(4)),
+                     rng.choice(('95', '1:45', '45:30', '')), f'{rng.uniform(1, 9.8):.1f}', ''))
+    conn.executemany('INSERT INTO videos(path, mtime, genres, year, directors, plot, actors, duration, rating, '
+                     'poster) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+    return rows
+
+
+def check(db_path, rows):
+    """Ritorna l'elenco dei problemi trovati aprendo (due volte) il DB migrato."""
+    problems = []
+    db = DBManager(db_path)
+    try:
+        cur = db.conn.cursor()
+        version = cur.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            problems.append(f'user_version {version} invece di {SCHEMA_VERSION}')
+        if db.count_videos() != len(rows):
+            problems.append(f'{db.count_videos()} righe invece di {len(rows)}')
+        if db.has_fts:
+            cur.execute("INSERT INTO videos_fts(videos_fts) VALUES ('integrity-check')")
+        word = os.path.splitext(os.path.basename(rows[0][0]))[0].split()[1]
+        expected = sum(word in os.path.basename(r[0]) or word in r[5] for r in rows)
+        found = len(db.video_ids(search=word))
+        if found < expected:
+            problems.append(f'ricerca "{word}": {found} risultati, attesi almeno {expected}')
+        if len(db.video_ids(search='libreria')) != 0:
+            problems.append('la ricerca trova le parole del percorso delle cartelle')
+        facets = sorted(map(tuple, cur.execute('SELECT kind, value, count FROM facets')))
+        db._rebuild_facets(cur)
+        if facets != sorted(map(tuple, cur.execute('SELECT kind, value, count FROM facets'))):
+            problems.append('faccette diverse da una ricostruzione completa')
+        db.conn.rollback()
+        missing = cur.execute("SELECT COUNT(*) FROM videos WHERE title IS NULL OR "
+                              "(duration != '' AND duration_sec IS NULL)").fetchone()[0]
+        if missing:
+            problems.append(f'{missing} righe senza titolo o durata numerica')
+        # una scrittura dopo la migrazione passa per i trigger ricreati
+        db.upsert_videos([{'path': rows[0][0], 'plot': 'riscritta dopo la migrazione'}])
+        if db.has_fts:
+            cur.execute("INSERT INTO videos_fts(videos_fts) VALUES ('integrity-check')")
+    except sqlite3.DatabaseError as e:
+        problems.append(f'errore SQLite: {e}')
+    finally:
+        db.close()
+    try:
+        DBManager(db_path).close()
+    except sqlite3.DatabaseError as e:
+        problems.append(f'riapertura fallita: {e}')
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('-n', type=int, default=2000, help='righe del DB di partenza')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'baseline.db')
+        rows = make_baseline_db(path, args.n, args.seed)
+        try:
+            problems = check(path, rows)
+        except sqlite3.DatabaseError as e:
+            problems = [f'apertura fallita: {e}']
+    for problem in problems:
+        print(f'ERRORE: {problem}', file=sys.stderr)
+    if problems:
+        return 1
+    print(f'schema originale con {args.n} righe -> v{SCHEMA_VERSION}: ok')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# synth_library.py
+# -*- coding: utf-8 -*-
+"""
+Genera una libreria finta per i benchmark: video vuoti in un albero profondo
+(genere/lettera/decennio/Titolo (Anno)/), .nfo in formato Kodi con generi, registi, attori,
+trama, durata e rating, locandine locali (poster.jpg) o remote finte (http://…invalid).
+
+    python benchmarks/synth_library.py /tmp/libreria -n 10000
+"""
+import argparse
+import os
+import random
+from xml.sax.saxutils import escape
+
+GENRES = ['Drama', 'Commedia', 'Thriller', 'Horror', 'Azione', 'Fantascienza', 'Animazione', 'Documentario',
+          'Docudrama', 'Western', 'Noir', 'Avventura', 'Romantico', 'Guerra', 'Musical']
+WORDS = ['notte', 'ritorno', 'ombra', 'città', 'fiume', 'ultimo', 'segreto', 'estate', 'lupo', 'vento',
+         'silenzio', 'strada', 'mare', 'fuoco', 'giorno', 'casa', 'viaggio', 'specchio', 'inverno', 'cuore']
+EXTENSIONS = ['.mkv', '.mp4', '.avi', '.mov']
+# un video su NO_NFO_EVERY non ha il .nfo
+NO_NFO_EVERY = 10
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).capitalize()
+
+
+def make_nfo(rng, title, year, genres, poster):
+    directors = [f'Regista {rng.randint(1, 2000)}' for _ in range(rng.choice((1, 1, 1, 2)))]
+    actors = [f'Attore {rng.randint(1, 20000)}' for _ in range(rng.randint(3, 12))]
+    plot = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(30, 120))).capitalize() + '.'
+    lines = ['<?xml version="1.0" encoding="UTF-8" standalone="yes" ?>', '<movie>',
+             f'    <title>{escape(title)}</title>',
+             f'    <originaltitle>{escape(title)}</originaltitle>',
+             f'    <year>{year}</year>',
+             f'    <rating>{rng.uniform(1, 9.8):.1f}</rating>',
+             f'    <votes>{rng.randint(10, 500000)}</votes>',
+             f'    <runtime>{rng.randint(70, 200)}</runtime>',
+             f'    <plot>{escape(plot)}</plot>',
+             f'    <tagline>{escape(_title(rng))}</tagline>']
+    lines += [f'    <genre>{g}</genre>' for g in genres]
+    lines += [f'    <director>{escape(d)}</director>' for d in directors]
+    lines.append(f'    <thumb aspect="poster">{escape(poster)}</thumb>')
+    for i, actor in enumerate(actors):
+        lines += ['    <actor>', f'        <name>{escape(actor)}</name>',
+                  f'        <role>{escape(_title(rng))}</role>', f'        <order>{i}</order>', '    </actor>']
+    lines += ['    <fileinfo>', '        <streamdetails>', '            <video>',
+              '                <codec>h264</codec>', '                <width>1920</width>',
+              '                <height>1080</height>', '            </video>', '        </streamdetails>',
+              '    </fileinfo>', '</movie>', '']
+    return '\n'.join(lines)
+
+
+def make_library(root, n, remote_posters=0.5, seed=0):
+    """Crea `n` video sotto `root` e ritorna il numero di .nfo scritti."""
+    rng = random.Random(seed)
+    nfo_count = 0
+    for i in range(n):
+        title = f'{_title(rng)} {i}'
+        year = rng.randint(1930, 2024)
+        genres = rng.sample(GENRES, rng.randint(1, 3))
+        folder = os.path.join(root, genres[0], title[0].upper(), f'{year // 10 * 10}s', f'{title} ({year})')
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f'{title} ({year})')
+        open(base + rng.choice(EXTENSIONS), 'wb').close()
+        if i % NO_NFO_EVERY == NO_NFO_EVERY - 1:
+            continue
+        if rng.random() < remote_posters:
+            poster = f'http://posters.invalid/{i}.jpg'
+        else:
+            poster = os.path.join(folder, 'poster.jpg')
+            with open(poster, 'wb') as f:
+                f.write(b'\xff\xd8\xff\xe0' + bytes(64))
+        with open(base + '.nfo', 'w', encoding='utf-8') as f:
+            f.write(make_nfo(rng, title, year, genres, poster))
+        nfo_count += 1
+    return nfo_count
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('root')
+    ap.add_argument('-n', type=int, default=1000, help='numero di video')
+    ap.add_argument('--remote-posters', type=float, default=0.5, help='quota di locandine remote (0-1)')
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args()
+    nfo = make_library(args.root, args.n, args.remote_posters, args.seed)
+    print(f'{args.n} video, {nfo} .nfo in {args.root}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+# cli.py
+# -*- coding: utf-8 -*-
+"""
+Playlist Manager da riga di comando, senza GUI: usa solo DBManager e NFOParser e non importa
+PyQt5 (tranne il comando `gui`), quindi parte in fretta anche su server headless / cron.
+L'output è JSON (una riga per risultato con `query`) per gli script.
+
+    python cli.py scan /media/film
+    python cli.py query --genre Drama --year 1999 --limit 20
+    python cli.py export catalogo.jsonl.gz
+    python cli.py playlist -n 10 --genre Horror --out stasera.m3u
+    python cli.py playlist --budget 3h --weighted --max-per-director 1
+    python cli.py prune --dry-run
+    python cli.py watch --interval 10
+    python cli.py stats
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from db_manager import DBManager, DB_FILENAME, SCAN_BATCH_SIZE, parse_duration
+from scanner import LibraryScanner, SCAN_WORKERS, drop_unreachable
+from playlist import (default_playlist_path, export_playlist, generate_playlist, regenerate_playlist, save_playlist,
+                      write_m3u, RECENT_DAYS)
+from watcher import PollingWatcher, POLL_INTERVAL_SECONDS
+from perfstats import perf, SLOW_QUERY_MS
+
+QUERY_FIELDS = ('id', 'path', 'genres', 'year', 'directors', 'plot', 'actors', 'duration', 'rating', 'poster', 'mtime')
+
+
+def _emit(obj):
+    sys.stdout.write(json.dumps(obj, ensure_ascii=False) + '\n')
+
+
+def _range(low, high):
+    return None if low is None and high is None else (low, high)
+
+
+def _duration_arg(value):
+    seconds = parse_duration(value)
+    if seconds is None:
+        raise argparse.ArgumentTypeError(f'durata non valida: {value}')
+    return seconds
+
+
+def _filters(args):
+    return {'genres': args.genre or None, 'years': args.year or None, 'directors': args.director or None,
+            'actors': args.actor or None, 'search': args.search,
+            'year_range': _range(args.year_from, args.year_to),
+            'rating_range': _range(args.min_rating, args.max_rating),
+            'duration_range': _range(args.min_duration, args.max_duration)}
+
+
+def cmd_scan(db, args):
+    last = [0.0]
+
+    def progress(stats):
+        # avanzamento su stderr, al massimo una riga al secondo
+        if args.progress and time.monotonic() - last[0] >= 1:
+            last[0] = time.monotonic()
+            print(f"discovered={stats['discovered']} parsed={stats['parsed']} written={stats['written']}",
+                  file=sys.stderr)
+
+    results = []
+    for root in args.roots:
+        if not os.path.isdir(root):
+            raise SystemExit(f'Cartella non valida: {root}')
+        scanner = LibraryScanner(db, workers=args.workers, batch_size=args.batch_size)
+        try:
+            stats = scanner.scan(root, incremental=not args.full, progress=progress)
+        except KeyboardInterrupt:
+            scanner.cancel()
+            raise
+        stats.pop('walk_done', None)
+        stats['root'] = os.path.abspath(root)
+        results.append(stats)
+    _emit(results[0] if len(results) == 1 else results)
+
+
+def cmd_query(db, args):
+    fields = args.fields.split(',') if args.fields else QUERY_FIELDS
+    unknown = [f for f in fields if f not in QUERY_FIELDS]
+    if unknown:
+        raise SystemExit(f"Campi non validi: {', '.join(unknown)}")
+    cursor = db.iter_videos(limit=args.limit, **_filters(args))
+    while True:
+        rows = cursor.fetchmany(500)
+        if not rows:
+            break
+        for row in rows:
+            _emit({f: row[f] for f in fields})
+
+
+def cmd_export(db, args):
+    count = db.export_videos(args.output, **_filters(args))
+    _emit({'output': os.path.abspath(args.output), 'rows': count})
+
+
+def cmd_playlist(db, args):
+    budget = None
+    if args.budget:
+        budget = parse_duration(args.budget)
+        if not budget:
+            raise SystemExit(f'Durata non valida: {args.budget}')
+    count = args.count if args.count is not None or budget else 5
+    options = dict(count=count, budget_seconds=budget, weight_by_rating=args.weighted,
+                   recent_days=args.recent_days, max_per_director=args.max_per_director,
+                   max_per_genre=args.max_per_genre, **_filters(args))
+    chosen = generate_playlist(db, **options)
+    if not chosen:
+        raise SystemExit('Nessun video corrisponde ai filtri.')
+    output = args.out or default_playlist_path()
+    playlist_id = None
+    if args.no_save:
+        write_m3u(output, chosen)
+    else:
+        playlist_id = save_playlist(db, chosen, options, name=args.name)
+        export_playlist(db, playlist_id, output)
+    if not args.no_history:
+        db.record_plays([row['id'] for row in chosen])
+    _emit({'output': os.path.abspath(output), 'playlist_id': playlist_id, 'entries': len(chosen),
+           'seconds': sum(row['seconds'] or 0 for row in chosen), 'paths': [row['path'] for row in chosen]})
+
+
+def cmd_playlists(db, args):
+    if args.action == 'list':
+        for playlist in db.get_playlists():
+            _emit(playlist)
+        return
+    if args.id is None:
+        raise SystemExit(f'Indicare l\'id della playlist per {args.action}')
+    playlist = db.get_playlist(args.id)
+    if playlist is None:
+        raise SystemExit(f'Playlist inesistente: {args.id}')
+    if args.action == 'show':
+        _emit(playlist)
+        cursor = db.iter_playlist_items(args.id)
+        for row in cursor:
+            _emit({'path': row['path'], 'year': row['year'], 'duration_sec': row['duration_sec'],
+                   'in_db': row['id'] is not None})
+    elif args.action == 'delete':
+        db.delete_playlist(args.id)
+        _emit({'deleted': args.id})
+    else:
+        if args.action == 'regenerate':
+            try:
+                chosen = regenerate_playlist(db, args.id)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if not args.no_history:
+                db.record_plays([row['id'] for row in chosen])
+        output = args.out or playlist['m3u_path'] or default_playlist_path()
+        entries = export_playlist(db, args.id, output)
+        _emit({'playlist_id': args.id, 'output': os.path.abspath(output), 'entries': entries})
+
+
+def cmd_prune(db, args):
+    for root in args.roots:
+        if not os.path.isdir(root):
+            raise SystemExit(f'Cartella non valida: {root}')
+    result = LibraryScanner(db).prune(args.roots or None, dry_run=args.dry_run)
+    _emit({'roots': result['roots'], 'skipped': result['skipped'], 'dry_run': args.dry_run,
+           'orphans': len(result['orphans']), 'removed': result['removed'], 'paths': result['orphans']})
+
+
+def cmd_watch(db, args):
+    roots = [os.path.abspath(r) for r in args.roots] or db.get_scan_roots()
+    if not roots:
+        raise SystemExit('Nessuna cartella da monitorare: eseguire prima `scan`.')
+    for root in roots:
+        db.add_scan_root(root)
+    poller = PollingWatcher(roots)
+    scanner = LibraryScanner(db, workers=args.workers)
+    pending = []
+    while True:
+        time.sleep(args.interval)
+        # radice smontata o vuota: le sottocartelle sono irraggiungibili, non eliminate
+        targets, unreachable = drop_unreachable(poller.poll(), roots)
+        if unreachable:
+            _emit({'unreachable': unreachable})
+            sys.stdout.flush()
+        if targets:
+            # raffica in corso: si aspetta un giro senza modifiche prima di applicare
+            pending.extend(targets)
+            continue
+        if pending:
+            stats = scanner.update(pending)
+            stats.pop('walk_done', None)
+            stats['targets'] = len(pending)
+            pending = []
+            _emit(stats)
+            sys.stdout.flush()
+
+
+def cmd_stats(db, args):
+    _emit(db.get_stats())
+
+
+def cmd_gui(db, args):
+    db.close()
+    from main_window import main  # Qt importato solo qui
+    return main([sys.argv[0]])
+
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog='cli.py', description='Playlist Manager senza GUI (output JSON).')
+    ap.add_argument('--db', default=DB_FILENAME, help='percorso del database (default: videos.db accanto al codice)')
+    ap.add_argument('--perf-log', help='file JSON Lines con le operazioni lente e il riepilogo dei tempi')
+    ap.add_argument('--slow-ms', type=float, default=SLOW_QUERY_MS, help='soglia delle operazioni lente (ms)')
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('--genre', action='append', help='genere (ripetibile, in OR)')
+    filters.add_argument('--year', action='append', help='anno (ripetibile, in OR)')
+    filters.add_argument('--director', action='append', help='regista (ripetibile, in OR)')
+    filters.add_argument('--actor', action='append', help='attore (ripetibile, in OR)')
+    filters.add_argument('--search', help='ricerca libera su titolo, trama, attori, registi, generi')
+    filters.add_argument('--year-from', type=int, help='anno minimo')
+    filters.add_argument('--year-to', type=int, help='anno massimo')
+    filters.add_argument('--min-rating', type=float, help='rating minimo')
+    filters.add_argument('--max-rating', type=float, help='rating massimo')
+    filters.add_argument('--min-duration', type=_duration_arg, help="durata minima, es. '90', '1:30', '1h30m'")
+    filters.add_argument('--max-duration', type=_duration_arg, help="durata massima, es. '100', '1h40m'")
+
+    p = sub.add_parser('scan', help='scansiona una o più cartelle (incrementale)')
+    p.add_argument('roots', nargs='+')
+    p.add_argument('--full', action='store_true', help='rilegge tutti i .nfo, non solo quelli modificati')
+    p.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    p.add_argument('--batch-size', type=int, default=SCAN_BATCH_SIZE)
+    p.add_argument('--progress', action='store_true', help='avanzamento su stderr')
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser('query', parents=[filters], help='elenca i video (JSON Lines)')
+    p.add_argument('--limit', type=int)
+    p.add_argument('--fields', help=f"campi separati da virgola ({','.join(QUERY_FIELDS)})")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('export', parents=[filters], help='esporta in CSV/JSONL (.gz per comprimere)')
+    p.add_argument('output')
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('playlist', parents=[filters], help='crea una playlist M3U casuale')
+    p.add_argument('-n', '--count', type=int, help='numero di titoli (default 5 senza --budget)')
+    p.add_argument('--budget', help="durata totale, es. '3h', '2h30m', '1:45', '90' (minuti)")
+    p.add_argument('--weighted', action='store_true', help='titoli con rating alto più probabili')
+    p.add_argument('--recent-days', type=int, default=RECENT_DAYS,
+                   help='escludi i titoli già messi in playlist negli ultimi N giorni (0 = nessuno)')
+    p.add_argument('--max-per-director', type=int, help='massimo titoli per regista')
+    p.add_argument('--max-per-genre', type=int, help='massimo titoli per genere')
+    p.add_argument('--no-history', action='store_true', help='non registrare la playlist nello storico')
+    p.add_argument('--out', help='file .m3u (default: random_playlist_<timestamp>.m3u nella home)')
+    p.add_argument('--name', help='nome della playlist salvata (default: data e ora)')
+    p.add_argument('--no-save', action='store_true', help='scrivi solo il file .m3u, senza salvarla nel DB')
+    p.set_defaults(func=cmd_playlist)
+
+    p = sub.add_parser('playlists', help='playlist salvate: elenco, titoli, export, rigenerazione, eliminazione')
+    p.add_argument('action', nargs='?', default='list', choices=('list', 'show', 'export', 'regenerate', 'delete'))
+    p.add_argument('id', nargs='?', type=int)
+    p.add_argument('--out', help='file .m3u per export/regenerate (default: quello già usato)')
+    p.add_argument('--no-history', action='store_true', help='con regenerate, non registrare i titoli nello storico')
+    p.set_defaults(func=cmd_playlists)
+
+    p = sub.add_parser('prune', help='elimina dal DB i video non più presenti su disco')
+    p.add_argument('roots', nargs='*', help='cartelle da controllare (default: quelle già scansionate)')
+    p.add_argument('--dry-run', action='store_true', help='mostra solo gli orfani, senza eliminarli')
+    p.set_defaults(func=cmd_prune)
+
+    p = sub.add_parser('watch', help='aggiorna il DB quando cambiano le cartelle (polling, Ctrl-C per uscire)')
+    p.add_argument('roots', nargs='*', help='cartelle da monitorare (default: quelle già scansionate)')
+    p.add_argument('--interval', type=float, default=POLL_INTERVAL_SECONDS, help='secondi tra due letture')
+    p.add_argument('--workers', type=int, default=SCAN_WORKERS)
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser('stats', help='riepilogo del catalogo')
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser('gui', help="avvia l'interfaccia grafica")
+    p.set_defaults(func=cmd_gui)
+    return ap
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.perf_log:
+        perf.enable_log(args.perf_log, args.slow_ms)
+    db = DBManager(args.db)
+    try:
+        return args.func(db, args) or 0
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1056 @@
+# db_manager.py
+# -*- coding: utf-8 -*-
+"""Accesso al database SQLite dei video (nessuna dipendenza da Qt)."""
+import sqlite3
+import os
+import csv
+import gzip
+import json
+import math
+import random
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from perfstats import perf, timed
+
+# DB nella stessa cartella del codice
+DB_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'videos.db')
+# colonne scritte dalla scansione (chiavi dei record passati a DBManager.upsert_videos)
+VIDEO_COLUMNS = ('path', 'mtime', 'genres', 'year', 'directors', 'plot', 'actors', 'duration', 'rating', 'poster',
+                 'size', 'nfo_mtime')
+# anno, rating e durata (secondi) in forma numerica, ricavati da year/rating/duration ad ogni scrittura
+NUMERIC_COLUMNS = ('year_num', 'rating_num', 'duration_sec')
+# colonne dell'indice full-text: del percorso solo il titolo (nome del file senza estensione),
+# altrimenti una parola delle cartelle superiori troverebbe tutta la libreria
+FTS_COLUMNS = ('title', 'plot', 'actors', 'directors', 'genres')
+# record scritti per transazione durante la scansione
+SCAN_BATCH_SIZE = 500
+# chiavi per query `IN (...)` nelle letture a blocchi (sotto il limite di 999 parametri dei vecchi SQLite)
+LOOKUP_CHUNK_SIZE = 500
+# colonne esportate (CSV/JSONL) e formati riconosciuti dall'estensione del file
+EXPORT_COLUMNS = ('id', 'path', 'genres', 'year', 'directors', 'plot', 'actors', 'duration', 'rating', 'poster', 'mtime')
+EXPORT_FORMATS = {'.csv': 'csv', '.csv.gz': 'csv', '.jsonl': 'jsonl', '.jsonl.gz': 'jsonl'}
+# cache dei risultati filtrati: numero massimo di combinazioni di filtri e memoria stimata
+QUERY_CACHE_ENTRIES = 64
+QUERY_CACHE_BYTES = 32 * 1024 * 1024
+# istruzioni della VM di SQLite tra due controlli di annullamento (progress handler)
+CANCEL_CHECK_STEPS = 1000
+# ordinamenti di fetch_all/fetch_page e colonna su cui ordinano quando è diversa (rating testuale)
+PAGE_ORDERS = ('id', 'path', 'year', 'mtime', 'rating')
+SORT_KEYS = {'rating': 'rating_num'}
+# versione dello schema (PRAGMA user_version), incrementata ad ogni migrazione
+SCHEMA_VERSION = 9
+# ruoli nella tabella video_person
+ROLE_DIRECTOR = 'director'
+ROLE_ACTOR = 'actor'
+# tipi di faccetta nella tabella facets (registi e attori usano il ruolo)
+FACET_GENRE = 'genre'
+FACET_YEAR = 'year'
+
+
+def _playlist_key(weight):
+    """
+    Chiave per il campionamento pesato senza reinserimento (Efraimidis-Spirakis): in ordine
+    crescente, ogni riga esce prima con probabilità proporzionale a `weight`.
+    """
+    if not weight or weight <= 0:
+        return math.inf
+    return -math.log(1.0 - random.random()) / weight
+
+
+_DURATION_UNITS = {'h': 3600, 'o': 3600, 'm': 60, 's': 1}
+# 'a:b' è ore:minuti solo fino a questo numero di ore: '45:30' o '12:05' sono minuti:secondi
+MAX_CLOCK_HOURS = 9
+
+
+def parse_duration(value, default_unit=60):
+    """
+    Secondi da una durata testuale: '120' (minuti, come <runtime> di Kodi), '1:45' o '1:45:00',
+    '45:30' (minuti:secondi, vedi MAX_CLOCK_HOURS), '105 min', '3h', '2h 5m', '2 ore'.
+    None se non interpretabile.
+    """
+    value = str(value or '').strip().lower().replace(',', '.')
+    if not value:
+        return None
+    if ':' in value:
+        try:
+            parts = [int(p) for p in value.split(':')]
+        except ValueError:
+            return None
+        if len(parts) == 2:
+            if parts[0] > MAX_CLOCK_HOURS:
+                return parts[0] * 60 + parts[1]
+            return parts[0] * 3600 + parts[1] * 60
+        if len(parts) == 3:
+            return parts[0] * 3600 + parts[1] * 60 + parts[2]
+        return None
+    tokens = re.findall(r'(\d+(?:\.\d+)?)\s*([a-z]*)', value)
+    if not tokens:
+        return None
+    seconds = 0.0
+    for number, unit in tokens:
+        multiplier = _DURATION_UNITS.get(unit[:1]) if unit else default_unit
+        if multiplier is None:
+            return None
+        seconds += float(number) * multiplier
+    return int(seconds) or None
+
+
+def parse_year(value):
+    """Anno da '1999', '1999-05-01' (premiered) e simili; None se assente."""
+    m = re.search(r'(?<!\d)(1[89]\d\d|2\d\d\d)(?!\d)', str(value or ''))
+    return int(m.group(1)) if m else None
+
+
+def parse_rating(value):
+    """Rating da '7.5', '7,5', '7.5/10'; None se assente."""
+    m = re.match(r'\s*(\d+(?:[.,]\d+)?)', str(value or ''))
+    return float(m.group(1).replace(',', '.')) if m else None
+
+
+def file_title(path):
+    """Titolo di un video: il nome del file senza cartella ed estensione."""
+    return os.path.splitext(os.path.basename(path or ''))[0]
+
+
+def split_serialized(s: str):
+    """Nomi di generi/registi/attori salvati come 'a|b' (o 'a, b' nei DB più vecchi)."""
+    if not s:
+        return []
+    if '|' in s:
+        parts = [p.strip() for p in s.split('|') if p.strip()]
+    else:
+        parts = [p.strip() for p in s.split(',') if p.strip()]
+    return parts
+
+
+def _numeric_values(year, rating, duration):
+    """Valori di NUMERIC_COLUMNS per i campi testuali dati."""
+    return parse_year(year), parse_rating(rating), parse_duration(duration)
+
+
+# --------------------------- Cache delle query ---------------------------
+class QueryCache:
+    """
+    Cache LRU dei risultati per combinazione di filtri, limitata per numero di voci e byte
+    stimati. Ogni voce ricorda la generazione del DB in cui è stata calcolata e non vale più
+    dopo una scrittura. Hit e miss finiscono anche nei contatori di perfstats.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_ENTRIES, max_bytes=QUERY_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # chiave -> (generazione, valore, byte)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, generation):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] != generation:
+            self.discard(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            perf.count('query_cache.miss')
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        perf.count('query_cache.hit')
+        return entry[1]
+
+    def put(self, key, generation, value, size):
+        self.discard(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (generation, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+# --------------------------- Gestore DB ---------------------------
+class DBManager:
+    """Database helper per la tabella `videos`."""
+
+    def __init__(self, db_path: str = DB_FILENAME):
+        self.db_path = db_path
+        # isolation_level=None => autocommit disattivato, usiamo commit manuale
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL: la GUI può leggere mentre il thread di scansione scrive su un'altra connessione
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.create_function('playlist_key', 1, _playlist_key)
+        self.query_cache = QueryCache()
+        self._writes = 0
+        self._ensure_schema()
+
+    def _ensure_schema(self):
+        cur = self.conn.cursor()
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS videos (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE,
+                mtime REAL,
+                genres TEXT,
+                year TEXT,
+                directors TEXT,
+                plot TEXT,
+                actors TEXT,
+                duration TEXT,
+                rating TEXT,
+                poster TEXT,
+                size INTEGER,
+                nfo_mtime REAL,
+                year_num INTEGER,
+                rating_num REAL,
+                duration_sec INTEGER,
+                title TEXT
+            )
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_path ON videos(path)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_year ON videos(year)')
+        # colonne di ordinamento della Gestione DB (paginazione a chiave su (colonna, id))
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_mtime ON videos(mtime)')
+        # (per il rating l'indice è idx_videos_rating_sort su rating_num, creato dalla migrazione v9)
+        # relazioni molti-a-molti: generi e persone (registi/attori) normalizzati per video
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS video_genre (
+                genre TEXT NOT NULL,
+                video_id INTEGER NOT NULL,
+                PRIMARY KEY (genre, video_id)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_video_genre_video ON video_genre(video_id)')
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS video_person (
+                role TEXT NOT NULL,
+                name TEXT NOT NULL,
+                video_id INTEGER NOT NULL,
+                PRIMARY KEY (role, name, video_id)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_video_person_video ON video_person(video_id)')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_videos_delete_links AFTER DELETE ON videos BEGIN
+                DELETE FROM video_genre WHERE video_id = old.id;
+                DELETE FROM video_person WHERE video_id = old.id;
+            END
+        ''')
+        # cartelle scansionate (radici per il monitoraggio e la pulizia degli orfani)
+        cur.execute('CREATE TABLE IF NOT EXISTS scan_roots (path TEXT PRIMARY KEY, last_scan REAL)')
+        # titoli finiti in una playlist, per non riproporli subito
+        cur.execute('CREATE TABLE IF NOT EXISTS play_history (video_id INTEGER NOT NULL, played_at REAL NOT NULL)')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_play_history_played ON play_history(played_at, video_id)')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_videos_delete_history AFTER DELETE ON videos BEGIN
+                DELETE FROM play_history WHERE video_id = old.id;
+            END
+        ''')
+        # playlist salvate: parametri di generate_playlist (JSON) e percorsi in ordine; i titoli si
+        # legano ai video per percorso, così una nuova scansione (id diversi) non li perde
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS playlists (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                created REAL NOT NULL,
+                options TEXT,
+                m3u_path TEXT
+            )
+        ''')
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS playlist_items (
+                playlist_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                PRIMARY KEY (playlist_id, position)
+            ) WITHOUT ROWID
+        ''')
+        cur.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_playlists_delete_items AFTER DELETE ON playlists BEGIN
+                DELETE FROM playlist_items WHERE playlist_id = old.id;
+            END
+        ''')
+        self._ensure_facets(cur)
+        self.conn.commit()
+        self._migrate()
+        # full-text solo dopo le migrazioni: i suoi trigger non devono scattare sulle righe riscritte
+        self.has_fts = self._ensure_fts(cur)
+        self.conn.commit()
+
+    def _ensure_facets(self, cur):
+        """
+        Conteggi per valore di genere/anno/regista/attore. Li aggiornano le scritture e le
+        eliminazioni, una volta per lotto (_apply_facet_deltas), non un trigger per riga.
+        """
+        cur.execute('''
+            CREATE TABLE IF NOT EXISTS facets (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (kind, value)
+            ) WITHOUT ROWID
+        ''')
+
+    @staticmethod
+    def _apply_facet_deltas(cur, deltas):
+        """Somma ai conteggi di `facets` le variazioni {(tipo, valore): n}; toglie i valori rimasti a zero."""
+        changes = [(kind, value, n) for (kind, value), n in deltas.items() if n]
+        cur.executemany('INSERT INTO facets(kind, value, count) VALUES (?, ?, ?) '
+                        'ON CONFLICT(kind, value) DO UPDATE SET count = count + excluded.count', changes)
+        cur.executemany('DELETE FROM facets WHERE kind = ? AND value = ? AND count <= 0',
+                        [(kind, value) for kind, value, n in changes if n < 0])
+
+    def _rebuild_facets(self, cur):
+        cur.execute('DELETE FROM facets')
+        cur.execute('INSERT INTO facets(kind, value, count) SELECT ?, genre, COUNT(*) FROM video_genre GROUP BY genre',
+                    (FACET_GENRE,))
+        cur.execute('INSERT INTO facets(kind, value, count) SELECT role, name, COUNT(*) FROM video_person GROUP BY role, name')
+        cur.execute("INSERT INTO facets(kind, value, count) SELECT ?, year, COUNT(*) FROM videos "
+                    "WHERE IFNULL(year, '') != '' GROUP BY year", (FACET_YEAR,))
+
+    def _ensure_fts(self, cur):
+        """Indice FTS5 (external content su `videos`) tenuto allineato dai trigger. False se FTS5 manca."""
+        try:
+            cur.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+                    title, plot, actors, directors, genres,
+                    content='videos', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"FTS5 non disponibile, ricerca testuale con LIKE: {e}")
+            return False
+        cols = ', '.join(FTS_COLUMNS)
+        new_vals = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+        old_vals = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_videos_fts_insert AFTER INSERT ON videos BEGIN
+                INSERT INTO videos_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+            END
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_videos_fts_delete AFTER DELETE ON videos BEGIN
+                INSERT INTO videos_fts(videos_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            END
+        ''')
+        # una nuova scansione riscrive anche le righe invariate: il full-text si tocca solo se cambia
+        changed = ' OR '.join(f'old.{c} IS NOT new.{c}' for c in FTS_COLUMNS)
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_videos_fts_update AFTER UPDATE OF {cols} ON videos
+            WHEN {changed} BEGIN
+                INSERT INTO videos_fts(videos_fts, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+                INSERT INTO videos_fts(rowid, {cols}) VALUES (new.id, {new_vals});
+            END
+        ''')
+        return True
+
+    def _migrate(self):
+        """Aggiorna i DB creati con versioni precedenti dello schema."""
+        cur = self.conn.cursor()
+        version = cur.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        columns = {row['name'] for row in cur.execute('PRAGMA table_info(videos)')}
+        # i trigger del full-text (e, prima della v6, l'indice con le vecchie colonne) si tolgono
+        # prima di riscrivere le righe e si ricreano alla fine
+        for event in ('insert', 'delete', 'update'):
+            cur.execute(f'DROP TRIGGER IF EXISTS trg_videos_fts_{event}')
+        if version < 6:
+            cur.execute('DROP TABLE IF EXISTS videos_fts')
+        if version < 1:
+            # v1: dimensione del video e mtime del .nfo per la scansione incrementale
+            if 'size' not in columns:
+                cur.execute('ALTER TABLE videos ADD COLUMN size INTEGER')
+            if 'nfo_mtime' not in columns:
+                cur.execute('ALTER TABLE videos ADD COLUMN nfo_mtime REAL')
+        if version < 2:
+            # v2: generi/registi/attori nelle tabelle di relazione; il vecchio indice su directors
+            # (stringa serializzata, mai usabile con LIKE '%x%') non serve più
+            cur.execute('DROP INDEX IF EXISTS idx_videos_directors')
+            rows = cur.execute('SELECT id, genres, directors, actors FROM videos').fetchall()
+            self._sync_links(cur, rows)
+        # v3 (indice full-text delle righe già presenti): ricostruito alla fine, con le colonne della v6
+        if version < 4:
+            # v4: tabella delle faccette con i conteggi delle righe già presenti
+            self._rebuild_facets(cur)
+        if version < 5:
+            # v5: anno, rating e durata numerici per i filtri a intervallo
+            for name, kind in zip(NUMERIC_COLUMNS, ('INTEGER', 'REAL', 'INTEGER')):
+                if name not in columns:
+                    cur.execute(f'ALTER TABLE videos ADD COLUMN {name} {kind}')
+            rows = cur.execute('SELECT id, year, rating, duration FROM videos').fetchall()
+            cur.executemany(f"UPDATE videos SET {' = ?, '.join(NUMERIC_COLUMNS)} = ? WHERE id = ?",
+                            [_numeric_values(r['year'], r['rating'], r['duration']) + (r['id'],) for r in rows])
+            # ogni indice porta anche le altre due colonne: intervalli combinati e conteggi
+            # si risolvono nell'indice senza leggere le righe
+            for i, name in enumerate(NUMERIC_COLUMNS):
+                others = NUMERIC_COLUMNS[:i] + NUMERIC_COLUMNS[i + 1:]
+                cur.execute(f"CREATE INDEX IF NOT EXISTS idx_videos_{name} ON videos({name}, {', '.join(others)})")
+        if version < 6:
+            # v6: nel full-text il titolo al posto del percorso intero (cartelle comprese)
+            if 'title' not in columns:
+                cur.execute('ALTER TABLE videos ADD COLUMN title TEXT')
+            rows = cur.execute('SELECT id, path FROM videos').fetchall()
+            cur.executemany('UPDATE videos SET title = ? WHERE id = ?',
+                            [(file_title(r['path']), r['id']) for r in rows])
+        if version < 7:
+            # v7: faccette aggiornate per lotto invece che dai trigger per riga; full-text
+            # aggiornato solo quando le sue colonne cambiano (trigger ricreato qui sotto)
+            for name in ('genre_insert', 'genre_delete', 'person_insert', 'person_delete', 'year_insert',
+                         'year_delete', 'year_update_old', 'year_update_new'):
+                cur.execute(f'DROP TRIGGER IF EXISTS trg_facets_{name}')
+        if version < 8:
+            # v8: durate 'mm:ss' (es. '45:30') lette come ore:minuti dalla v5
+            rows = cur.execute("SELECT id, duration FROM videos WHERE duration LIKE '%:%'").fetchall()
+            cur.executemany('UPDATE videos SET duration_sec = ? WHERE id = ?',
+                            [(parse_duration(r['duration']), r['id']) for r in rows])
+        if version < 9:
+            # v9: la Gestione DB ordina il rating sul valore numerico; l'indice sul testo non serve più
+            cur.execute('DROP INDEX IF EXISTS idx_videos_rating')
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_rating_sort ON videos(rating_num)')
+        self.has_fts = self._ensure_fts(cur)
+        if self.has_fts and version < 6:
+            # v3/v6: indice full-text delle righe già presenti
+            cur.execute("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')")
+        cur.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.commit()
+
+    def generation(self):
+        """
+        Generazione dei dati: cambia con ogni scrittura fatta da questa connessione (contatore
+        locale) o da un'altra, per esempio il thread di scansione (PRAGMA data_version).
+        """
+        return self._writes, self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _wrote(self):
+        self._writes += 1
+        self.query_cache.clear()
+
+    @contextmanager
+    def interruptible(self, canceled, steps=CANCEL_CHECK_STEPS):
+        """
+        Le query eseguite nel blocco si fermano con sqlite3.OperationalError ('interrupted')
+        appena `canceled()` diventa vero; il controllo avviene ogni `steps` istruzioni di SQLite.
+        """
+        self.conn.set_progress_handler(lambda: 1 if canceled() else 0, steps)
+        try:
+            yield
+        finally:
+            self.conn.set_progress_handler(None, steps)
+
+    def close(self):
+        try:
+            self.conn.commit()
+            self.conn.close()
+        except Exception:
+            pass
+
+    # CRUD minimi usati dall’app
+    def add_or_update_video(self, path, mtime, genres, year, directors, plot, actors, duration, rating, poster,
+                            size=None, nfo_mtime=None):
+        self.upsert_videos([{'path': path, 'mtime': mtime, 'genres': genres, 'year': year, 'directors': directors,
+                             'plot': plot, 'actors': actors, 'duration': duration, 'rating': rating, 'poster': poster,
+                             'size': size, 'nfo_mtime': nfo_mtime}])
+
+    @timed('db.upsert_videos')
+    def upsert_videos(self, records, batch_size=SCAN_BATCH_SIZE):
+        """Inserisce o aggiorna in blocco i video (dict con le chiavi di VIDEO_COLUMNS).
+
+        I record sono scritti a lotti di `batch_size`, ognuno in una sola transazione con
+        `executemany`. ON CONFLICT(path) DO UPDATE aggiorna la riga esistente, che mantiene il
+        proprio id. Ritorna il numero di record scritti.
+        """
+        written_columns = VIDEO_COLUMNS + NUMERIC_COLUMNS + ('title',)
+        columns = ', '.join(written_columns)
+        placeholders = ', '.join(['?'] * len(written_columns))
+        updates = ', '.join(f'{c} = excluded.{c}' for c in written_columns if c != 'path')
+        sql = (f'INSERT INTO videos({columns}) VALUES ({placeholders}) '
+               f'ON CONFLICT(path) DO UPDATE SET {updates}')
+        written = 0
+        batch = []
+        for rec in records:
+            batch.append(tuple(rec.get(c) for c in VIDEO_COLUMNS) +
+                         _numeric_values(rec.get('year'), rec.get('rating'), rec.get('duration')) +
+                         (file_title(rec.get('path')),))
+            if len(batch) >= batch_size:
+                written += self._write_batch(sql, batch)
+                batch = []
+        if batch:
+            written += self._write_batch(sql, batch)
+        return written
+
+    def _write_batch(self, sql, rows):
+        paths = [r[0] for r in rows]
+        placeholders = ','.join(['?'] * len(paths))
+        select = f'SELECT id, year, genres, directors, actors FROM videos WHERE path IN ({placeholders})'
+        with self.conn:  # transazione esplicita: commit a fine lotto, rollback in caso di errore
+            cur = self.conn.cursor()
+            # stato precedente delle righe già presenti: legami e faccette cambiano solo per differenza
+            previous = {row['id']: row for row in cur.execute(select, paths).fetchall()}
+            cur.executemany(sql, rows)
+            # id dei record appena scritti (ON CONFLICT ... DO UPDATE non cambia gli id esistenti)
+            written = cur.execute(select, paths).fetchall()
+            deltas = self._sync_links(cur, written, previous)
+            for row in written:
+                old = previous.get(row['id'])
+                old_year = old['year'] if old is not None else None
+                if old_year != row['year']:
+                    if old_year:
+                        deltas[FACET_YEAR, old_year] -= 1
+                    if row['year']:
+                        deltas[FACET_YEAR, row['year']] += 1
+            self._apply_facet_deltas(cur, deltas)
+        self._wrote()
+        return len(rows)
+
+    def _links(self, row):
+        """{(ruolo o FACET_GENRE, valore)} dei generi/registi/attori serializzati nella riga."""
+        return ({(FACET_GENRE, g) for g in split_serialized(row['genres'])} |
+                {(ROLE_DIRECTOR, d) for d in split_serialized(row['directors'])} |
+                {(ROLE_ACTOR, a) for a in split_serialized(row['actors'])})
+
+    def _sync_links(self, cur, rows, previous=None):
+        """
+        Allinea video_genre/video_person alle righe (id, genres, directors, actors) date, scrivendo
+        solo i legami aggiunti o tolti rispetto a `previous` ({id: riga precedente}; senza, la
+        riga è nuova). Ritorna le variazioni dei conteggi delle faccette {(tipo, valore): n}.
+        """
+        deltas = Counter()
+        added, removed = [], []
+        for row in rows:
+            old = previous.get(row['id']) if previous else None
+            if old is not None and (old['genres'], old['directors'], old['actors']) == \
+                    (row['genres'], row['directors'], row['actors']):
+                continue
+            new_links = self._links(row)
+            old_links = self._links(old) if old is not None else set()
+            for kind, value in new_links - old_links:
+                deltas[kind, value] += 1
+                added.append((kind, value, row['id']))
+            for kind, value in old_links - new_links:
+                deltas[kind, value] -= 1
+                removed.append((kind, value, row['id']))
+        cur.executemany('DELETE FROM video_genre WHERE genre = ? AND video_id = ?',
+                        [(v, vid) for k, v, vid in removed if k == FACET_GENRE])
+        cur.executemany('DELETE FROM video_person WHERE role = ? AND name = ? AND video_id = ?',
+                        [link for link in removed if link[0] != FACET_GENRE])
+        cur.executemany('INSERT OR IGNORE INTO video_genre(genre, video_id) VALUES (?, ?)',
+                        [(v, vid) for k, v, vid in added if k == FACET_GENRE])
+        cur.executemany('INSERT OR IGNORE INTO video_person(role, name, video_id) VALUES (?, ?, ?)',
+                        [link for link in added if link[0] != FACET_GENRE])
+        return deltas
+
+    def _delete_videos(self, cur, where, params):
+        """`DELETE FROM videos {where}`, togliendo prima dalle faccette i conteggi delle righe eliminate."""
+        ids = f'SELECT id FROM videos {where}'
+        deltas = Counter()
+        queries = (
+            (f'SELECT ?, genre, COUNT(*) FROM video_genre WHERE video_id IN ({ids}) GROUP BY genre',
+             [FACET_GENRE, *params]),
+            (f'SELECT role, name, COUNT(*) FROM video_person WHERE video_id IN ({ids}) GROUP BY role, name',
+             list(params)),
+            (f"SELECT ?, year, COUNT(*) FROM videos WHERE id IN ({ids}) AND IFNULL(year, '') != '' GROUP BY year",
+             [FACET_YEAR, *params]),
+        )
+        for sql, args in queries:
+            for kind, value, n in cur.execute(sql, args).fetchall():
+                deltas[kind, value] -= n
+        self._apply_facet_deltas(cur, deltas)
+        cur.execute(f'DELETE FROM videos {where}', params)
+        return cur.rowcount
+
+    @timed('db.get_scan_state')
+    def get_scan_state(self, root, recursive=True):
+        """
+        Ritorna {path: (mtime, size, nfo_mtime)} dei video già nel DB sotto la cartella `root`
+        (con recursive=False solo quelli direttamente nella cartella).
+        """
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        # intervallo [prefix, prefix + carattere successivo al separatore): usa l'indice su path
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        cur = self.conn.cursor()
+        cur.execute('SELECT path, mtime, size, nfo_mtime FROM videos WHERE path >= ? AND path < ?', (prefix, upper))
+        return {row['path']: (row['mtime'], row['size'], row['nfo_mtime']) for row in cur
+                if recursive or os.path.dirname(row['path']) == root}
+
+    def add_scan_root(self, root):
+        with self.conn:
+            self.conn.execute('INSERT INTO scan_roots(path, last_scan) VALUES (?, ?) '
+                              'ON CONFLICT(path) DO UPDATE SET last_scan = excluded.last_scan',
+                              (os.path.abspath(root), time.time()))
+
+    def get_scan_roots(self):
+        cur = self.conn.cursor()
+        cur.execute('SELECT path FROM scan_roots ORDER BY path')
+        return [row['path'] for row in cur]
+
+    def remove_scan_root(self, root):
+        with self.conn:
+            self.conn.execute('DELETE FROM scan_roots WHERE path = ?', (os.path.abspath(root),))
+
+    @timed('db.delete_paths')
+    def delete_paths(self, paths, chunk_size=500, progress=None):
+        """
+        Elimina i video con i percorsi dati, una transazione per blocco: il lock di scrittura
+        viene rilasciato tra un blocco e l'altro. `progress(eliminati, totale)` dopo ogni blocco.
+        """
+        paths = list(paths)
+        count = 0
+        for i in range(0, len(paths), chunk_size):
+            chunk = paths[i:i + chunk_size]
+            placeholders = ','.join(['?'] * len(chunk))
+            with self.conn:
+                count += self._delete_videos(self.conn.cursor(), f'WHERE path IN ({placeholders})', chunk)
+            self._wrote()
+            if progress:
+                progress(min(i + chunk_size, len(paths)), len(paths))
+        return count
+
+    @timed('db.get_facets')
+    def get_facets(self, kind):
+        """[(valore, conteggio)] di una faccetta (FACET_GENRE, FACET_YEAR, ROLE_DIRECTOR, ROLE_ACTOR)."""
+        cur = self.conn.cursor()
+        if kind == FACET_YEAR:
+            order = 'CAST(value AS INTEGER) DESC, value DESC'
+        else:
+            order = 'value COLLATE NOCASE'
+        cur.execute(f'SELECT value, count FROM facets WHERE kind = ? ORDER BY {order}', (kind,))
+        return [(row['value'], row['count']) for row in cur]
+
+    def get_all_genres(self):
+        return [v for v, _ in self.get_facets(FACET_GENRE)]
+
+    def get_all_years(self):
+        return [v for v, _ in self.get_facets(FACET_YEAR)]
+
+    def get_all_directors(self):
+        return [v for v, _ in self.get_facets(ROLE_DIRECTOR)]
+
+    def get_all_actors(self):
+        return [v for v, _ in self.get_facets(ROLE_ACTOR)]
+
+    @timed('db.facet_counts')
+    def facet_counts(self, kind, genres=None, years=None, directors=None, actors=None, search=None,
+                     year_range=None, rating_range=None, duration_range=None):
+        """
+        {valore: conteggio} della faccetta `kind` ristretti ai video che passano gli altri filtri
+        (il filtro della faccetta stessa è ignorato: il conteggio dice quanti titoli resterebbero
+        scegliendo quel valore). Senza altri filtri legge direttamente la tabella facets.
+        """
+        filters = {'genres': genres, 'years': years, 'directors': directors, 'actors': actors, 'search': search,
+                   'year_range': year_range, 'rating_range': rating_range, 'duration_range': duration_range}
+        own = {FACET_GENRE: 'genres', FACET_YEAR: 'years', ROLE_DIRECTOR: 'directors', ROLE_ACTOR: 'actors'}[kind]
+        filters[own] = None
+        if not any(filters.values()):
+            return dict(self.get_facets(kind))
+        join, where, params, _ = self._filter_sql(**filters)
+        matching = f'SELECT videos.id FROM videos {join}{where}'
+        if kind == FACET_GENRE:
+            q = f'SELECT genre AS value, COUNT(*) AS n FROM video_genre WHERE video_id IN ({matching}) GROUP BY genre'
+        elif kind == FACET_YEAR:
+            q = (f"SELECT year AS value, COUNT(*) AS n FROM videos {join}{where or 'WHERE 1'} "
+                 f"AND IFNULL(year, '') != '' GROUP BY year")
+        else:
+            q = (f'SELECT name AS value, COUNT(*) AS n FROM video_person '
+                 f'WHERE role = ? AND video_id IN ({matching}) GROUP BY name')
+            params = [kind] + params
+        cur = self.conn.cursor()
+        cur.execute(q, params)
+        return {row['value']: row['n'] for row in cur}
+
+    @staticmethod
+    def _fts_query(text):
+        """Testo libero -> query FTS5: ogni parola è un prefisso tra virgolette, tutte obbligatorie."""
+        return ' '.join(f'"{t}"*' for t in re.findall(r'\w+', text))
+
+    @timed('db.query_videos')
+    def query_videos(self, genres=None, years=None, directors=None, actors=None, search=None, limit=1000,
+                     year_range=None, rating_range=None, duration_range=None):
+        """
+        Video filtrati. Generi, anni, registi e attori sono elenchi di valori (in OR); gli intervalli
+        sono coppie (minimo, massimo) con None per l'estremo aperto: `year_range` in anni,
+        `rating_range` sul rating, `duration_range` in secondi. Gli id del risultato vengono dalla
+        cache (video_ids), le righe da una lettura per chiave primaria.
+        """
+        ids = self.video_ids(genres=genres, years=years, directors=directors, actors=actors, search=search,
+                             year_range=year_range, rating_range=rating_range, duration_range=duration_range)
+        return self.get_videos_by_ids(ids if limit is None else ids[:limit])
+
+    @timed('db.video_ids')
+    def video_ids(self, **filters):
+        """
+        Id dei video filtrati (filtri come query_videos) nell'ordine dei risultati. La lista
+        resta in query_cache per combinazione di filtri finché il DB non cambia: tornare su una
+        selezione già vista non rifà la query.
+        """
+        key = self._filter_key(**filters)
+        generation = self.generation()
+        ids = self.query_cache.get(key, generation)
+        if ids is None:
+            join, where, params, order = self._filter_sql(**filters)
+            cur = self.conn.cursor()
+            cur.execute(f'SELECT videos.id FROM videos {join}{where} ORDER BY {order}', params)
+            ids = tuple(row[0] for row in cur)
+            # tupla + un int per id (stima per il limite di memoria)
+            self.query_cache.put(key, generation, ids, sys.getsizeof(ids) + 32 * len(ids))
+        return ids
+
+    @staticmethod
+    def _filter_key(genres=None, years=None, directors=None, actors=None, search=None,
+                    year_range=None, rating_range=None, duration_range=None):
+        """Chiave di cache dei filtri: gli stessi valori selezionati in ordine diverso danno la stessa chiave."""
+        def values(v):
+            return tuple(sorted(set(v))) if v else None
+
+        def bounds(v):
+            return tuple(v) if v and any(b is not None for b in v) else None
+        # l'ordine dei risultati dipende solo dalla ricerca (rilevanza o percorso): è già nella chiave
+        return (values(genres), values(years), values(directors), values(actors), ' '.join((search or '').split()),
+                bounds(year_range), bounds(rating_range), bounds(duration_range))
+
+    @timed('db.iter_videos')
+    def iter_videos(self, genres=None, years=None, directors=None, actors=None, search=None, limit=None,
+                    year_range=None, rating_range=None, duration_range=None):
+        """Come query_videos ma ritorna il cursore aperto (da leggere con fetchmany); limit=None = nessun limite."""
+        join, where, params, order = self._filter_sql(genres, years, directors, actors, search,
+                                                      year_range, rating_range, duration_range)
+        q = ("SELECT id, path, genres, year, directors, plot, actors, duration, rating, poster, mtime "
+             "FROM videos " + join + where + f" ORDER BY {order}")
+        if limit is not None:
+            q += " LIMIT ?"
+            params.append(limit)
+        cur = self.conn.cursor()
+        cur.execute(q, params)
+        return cur
+
+    @timed('db.get_videos_by_ids')
+    def get_videos_by_ids(self, ids, chunk_size=LOOKUP_CHUNK_SIZE):
+        """Righe (dict) dei video con gli id dati, nello stesso ordine; None per gli id assenti."""
+        return self._get_videos_by('id', ids, chunk_size)
+
+    @timed('db.iter_playlist_candidates')
+    def iter_playlist_candidates(self, weight_by_rating=False, recent_since=None, **filters):
+        """
+        Cursore sui video filtrati in ordine casuale, per estrarre una playlist leggendo solo le
+        prime righe. Con `weight_by_rating` l'ordine è un campionamento pesato (1 + rating); con
+        `recent_since` (timestamp) sono esclusi i titoli messi in playlist da allora.
+        """
+        join, where, params, _ = self._filter_sql(**filters)
+        if recent_since is not None:
+            where += (' AND ' if where else 'WHERE ') + \
+                'id NOT IN (SELECT video_id FROM play_history WHERE played_at >= ?)'
+            params.append(recent_since)
+        order = 'playlist_key(1 + MAX(IFNULL(rating_num, 0), 0))' if weight_by_rating else 'random()'
+        cur = self.conn.cursor()
+        cur.execute(f'SELECT id, path, genres, year, directors, duration, rating, duration_sec FROM videos '
+                    f'{join}{where} ORDER BY {order}', params)
+        return cur
+
+    def record_plays(self, video_ids, played_at=None):
+        played_at = time.time() if played_at is None else played_at
+        with self.conn:
+            self.conn.executemany('INSERT INTO play_history(video_id, played_at) VALUES (?, ?)',
+                                  [(vid, played_at) for vid in video_ids])
+
+    # --- playlist salvate ---
+    @timed('db.create_playlist')
+    def create_playlist(self, name, paths, options=None, m3u_path=None):
+        """Salva una playlist (percorsi in ordine, parametri di generazione facoltativi) e ne ritorna l'id."""
+        with self.conn:
+            cur = self.conn.execute('INSERT INTO playlists(name, created, options, m3u_path) VALUES (?, ?, ?, ?)',
+                                    (name, time.time(), None if options is None else json.dumps(options), m3u_path))
+            playlist_id = cur.lastrowid
+            self._insert_playlist_items(playlist_id, paths)
+        return playlist_id
+
+    @timed('db.set_playlist_items')
+    def set_playlist_items(self, playlist_id, paths):
+        """Sostituisce i titoli della playlist (per la rigenerazione)."""
+        with self.conn:
+            self.conn.execute('DELETE FROM playlist_items WHERE playlist_id = ?', (playlist_id,))
+            self._insert_playlist_items(playlist_id, paths)
+
+    def _insert_playlist_items(self, playlist_id, paths):
+        self.conn.executemany('INSERT INTO playlist_items(playlist_id, position, path) VALUES (?, ?, ?)',
+                              ((playlist_id, i, p) for i, p in enumerate(paths)))
+
+    def set_playlist_m3u(self, playlist_id, m3u_path):
+        with self.conn:
+            self.conn.execute('UPDATE playlists SET m3u_path = ? WHERE id = ?', (m3u_path, playlist_id))
+
+    def delete_playlist(self, playlist_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM playlists WHERE id = ?', (playlist_id,))
+
+    @timed('db.get_playlists')
+    def get_playlists(self):
+        """Playlist salvate, dalla più recente: dict con id, name, created, m3u_path, items, seconds."""
+        cur = self.conn.cursor()
+        cur.execute('''SELECT p.id, p.name, p.created, p.m3u_path, COUNT(i.position) AS items,
+                              SUM(v.duration_sec) AS seconds
+                       FROM playlists p
+                       LEFT JOIN playlist_items i ON i.playlist_id = p.id
+                       LEFT JOIN videos v ON v.path = i.path
+                       GROUP BY p.id
+                       ORDER BY p.created DESC, p.id DESC''')
+        return [dict(row) for row in cur]
+
+    def get_playlist(self, playlist_id):
+        """Intestazione della playlist con `options` già decodificato; None se non esiste."""
+        row = self.conn.execute('SELECT id, name, created, options, m3u_path FROM playlists WHERE id = ?',
+                                (playlist_id,)).fetchone()
+        if row is None:
+            return None
+        playlist = dict(row)
+        playlist['options'] = json.loads(playlist['options']) if playlist['options'] else None
+        return playlist
+
+    @timed('db.iter_playlist_items')
+    def iter_playlist_items(self, playlist_id):
+        """
+        Cursore sui titoli della playlist in ordine, con le colonne di EXPORT_COLUMNS più
+        duration_sec, in una sola query. I file non (più) nel DB hanno solo il percorso.
+        """
+        columns = ', '.join('i.path' if c == 'path' else f'v.{c}' for c in EXPORT_COLUMNS)
+        cur = self.conn.cursor()
+        cur.execute(f'''SELECT {columns}, v.duration_sec
+                        FROM playlist_items i LEFT JOIN videos v ON v.path = i.path
+                        WHERE i.playlist_id = ?
+                        ORDER BY i.position''', (playlist_id,))
+        return cur
+
+    def get_playlist_items(self, playlist_id):
+        return [dict(row) for row in self.iter_playlist_items(playlist_id)]
+
+    def _get_videos_by(self, column, keys, chunk_size):
+        keys = list(keys)
+        found = {}
+        cur = self.conn.cursor()
+        unique = list(dict.fromkeys(keys))
+        for i in range(0, len(unique), chunk_size):
+            chunk = unique[i:i + chunk_size]
+            placeholders = ','.join(['?'] * len(chunk))
+            cur.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM videos WHERE {column} IN ({placeholders})", chunk)
+            for row in cur:
+                found[row[column]] = dict(row)
+        return [found.get(k) for k in keys]
+
+    def _filter_sql(self, genres=None, years=None, directors=None, actors=None, search=None,
+                    year_range=None, rating_range=None, duration_range=None):
+        """(join, where, params, order) dei filtri, da usare dopo `FROM videos `."""
+        conditions = []
+        params = []
+        join = ''
+        order = 'path'
+
+        # ricerca libera: risultati FTS5 ordinati per rilevanza (bm25), combinati con gli altri filtri
+        terms = self._fts_query(search) if search else ''
+        if terms and self.has_fts:
+            join = 'JOIN (SELECT rowid, rank FROM videos_fts WHERE videos_fts MATCH ?) AS fts ON fts.rowid = videos.id '
+            params.append(terms)
+            order = 'fts.rank, path'
+        elif terms:
+            for word in re.findall(r'\w+', search):
+                conditions.append("(IFNULL(title, '') || ' ' || IFNULL(plot, '') || ' ' || "
+                                  "IFNULL(actors, '') || ' ' || IFNULL(directors, '') || ' ' || "
+                                  "IFNULL(genres, '')) LIKE ?")
+                params.append(f'%{word}%')
+
+        # corrispondenza esatta sulle tabelle di relazione (indice sulla chiave primaria)
+        if genres:
+            placeholders = ','.join(['?'] * len(genres))
+            conditions.append(f'id IN (SELECT video_id FROM video_genre WHERE genre IN ({placeholders}))')
+            params.extend(genres)
+
+        if years:
+            placeholders = ','.join(['?'] * len(years))
+            conditions.append(f'year IN ({placeholders})')
+            params.extend(years)
+
+        for role, names in ((ROLE_DIRECTOR, directors), (ROLE_ACTOR, actors)):
+            if names:
+                placeholders = ','.join(['?'] * len(names))
+                conditions.append(f'id IN (SELECT video_id FROM video_person WHERE role = ? AND name IN ({placeholders}))')
+                params.append(role)
+                params.extend(names)
+
+        # intervalli sulle colonne numeriche (indici idx_videos_<colonna>)
+        for column, bounds in zip(NUMERIC_COLUMNS, (year_range, rating_range, duration_range)):
+            low, high = bounds or (None, None)
+            if low is not None:
+                conditions.append(f'{column} >= ?')
+                params.append(low)
+            if high is not None:
+                conditions.append(f'{column} <= ?')
+                params.append(high)
+
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        return join, where, params, order
+
+    # --- funzioni a supporto della finestra Gestione DB ---
+    @timed('db.fetch_all')
+    def fetch_all(self, order_by="path"):
+        order_clause = SORT_KEYS.get(order_by, order_by) if order_by in PAGE_ORDERS else "path"
+        cur = self.conn.cursor()
+        cur.execute(f'''SELECT id, path, genres, year, directors, plot, actors, duration, rating, poster, mtime
+                        FROM videos
+                        ORDER BY {order_clause}''')
+        return cur.fetchall()
+
+    @timed('db.count_videos')
+    def count_videos(self, **filters):
+        join, where, params, _ = self._filter_sql(**filters)
+        cur = self.conn.cursor()
+        cur.execute(f'SELECT COUNT(*) FROM videos {join}{where}', params)
+        return cur.fetchone()[0]
+
+    @timed('db.export_videos')
+    def export_videos(self, path, header=None, chunk_size=1000, progress=None, cancel_event=None, **filters):
+        """
+        Esporta i video (con i filtri di iter_videos) in CSV o JSON Lines, gzip se il nome finisce
+        in .gz. Le righe arrivano dal cursore a blocchi di `chunk_size` e vanno dritte nel file:
+        memoria costante anche su cataloghi grandi. `progress(scritti, totale)` dopo ogni blocco;
+        con `cancel_event` impostato l'export si ferma e il file parziale viene eliminato.
+        Ritorna il numero di righe scritte.
+        """
+        lower = path.lower()
+        fmt = next((f for ext, f in EXPORT_FORMATS.items() if lower.endswith(ext)), 'csv')
+        total = self.count_videos(**filters) if progress else 0
+        cursor = self.iter_videos(**filters)
+        tmp = path + '.part'
+        opener = gzip.open if lower.endswith('.gz') else open
+        written = 0
+        try:
+            with opener(tmp, 'wt', encoding='utf-8', newline='') as f:
+                if fmt == 'csv':
+                    writer = csv.writer(f)
+                    writer.writerow(header or EXPORT_COLUMNS)
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        break
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    if fmt == 'csv':
+                        writer.writerows([r[c] for c in EXPORT_COLUMNS] for r in rows)
+                    else:
+                        f.writelines(json.dumps({c: r[c] for c in EXPORT_COLUMNS}, ensure_ascii=False) + '\n'
+                                     for r in rows)
+                    written += len(rows)
+                    if progress:
+                        progress(written, total)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        finally:
+            cursor.close()
+        if cancel_event is not None and cancel_event.is_set():
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, path)
+        return written
+
+    @timed('db.fetch_page')
+    def fetch_page(self, order_by="path", descending=False, after=None, limit=200):
+        """
+        Pagina di `videos` ordinata per (order_by, id) con paginazione a chiave (seek): `after` è la
+        coppia (sort_key, id) dell'ultima riga della pagina precedente, None per la prima. Ogni riga
+        porta in `sort_key` il valore della colonna di ordinamento (`rating_num` per il rating).
+        Niente OFFSET: il confronto fra valori di riga `(colonna, id) > (?, ?)` è una ricerca
+        sull'indice della colonna; le righe con la colonna NULL (prima di tutte in ASC, dopo in DESC,
+        come ordina SQLite) hanno una query a parte. La trama è troncata.
+        """
+        col = SORT_KEYS.get(order_by, order_by) if order_by in PAGE_ORDERS else 'path'
+        direction = 'DESC' if descending else 'ASC'
+        op = '<' if descending else '>'
+        if after is None:
+            parts = [('', [])]
+        elif col == 'id':
+            parts = [(f'WHERE id {op} ?', [after[1]])]
+        else:
+            value, vid = after
+            if value is None:
+                parts = [(f'WHERE {col} IS NULL AND id {op} ?', [vid])]
+                if not descending:
+                    parts.append((f'WHERE {col} IS NOT NULL', []))
+            else:
+                parts = [(f'WHERE ({col}, id) {op} (?, ?)', [value, vid])]
+                if descending:
+                    parts.append((f'WHERE {col} IS NULL', []))
+        order = f'id {direction}' if col == 'id' else f'{col} {direction}, id {direction}'
+        cur = self.conn.cursor()
+        rows = []
+        for where, params in parts:
+            cur.execute(f'''SELECT id, path, genres, year, directors, substr(plot, 1, 200) AS plot, actors,
+                                   duration, rating, poster, mtime, {col} AS sort_key
+                            FROM videos {where}
+                            ORDER BY {order}
+                            LIMIT ?''', params + [limit - len(rows)])
+            rows += cur.fetchall()
+            if len(rows) >= limit:
+                break
+        return rows
+
+    @timed('db.delete_by_field_match')
+    def delete_by_field_match(self, field: str, value: str, use_like: bool = True):
+        allowed = {"path", "genres", "year", "directors", "actors", "duration", "rating", "poster"}
+        if field not in allowed:
+            raise ValueError("Campo non valido")
+        with self.conn:
+            count = self._delete_videos(self.conn.cursor(), f"WHERE {field} {'LIKE' if use_like else '='} ?", (value,))
+        self._wrote()
+        return count
+
+    @timed('db.delete_ids')
+    def delete_ids(self, ids):
+        if not ids:
+            return 0
+        placeholders = ','.join(['?'] * len(ids))
+        with self.conn:
+            count = self._delete_videos(self.conn.cursor(), f'WHERE id IN ({placeholders})', list(ids))
+        self._wrote()
+        return count
+
+    def get_stats(self):
+        """Riepilogo del catalogo (per `cli.py stats`)."""
+        cur = self.conn.cursor()
+        stats = {
+            'db': self.db_path,
+            'schema_version': cur.execute('PRAGMA user_version').fetchone()[0],
+            'videos': self.count_videos(),
+            'with_nfo': cur.execute('SELECT COUNT(*) FROM videos WHERE nfo_mtime IS NOT NULL').fetchone()[0],
+        }
+        for kind, key in ((FACET_GENRE, 'genres'), (FACET_YEAR, 'years'), (ROLE_DIRECTOR, 'directors'),
+                          (ROLE_ACTOR, 'actors')):
+            stats[key] = cur.execute('SELECT COUNT(*) FROM facets WHERE kind = ?', (kind,)).fetchone()[0]
+        stats['top_genres'] = [[row['value'], row['count']] for row in cur.execute(
+            'SELECT value, count FROM facets WHERE kind = ? ORDER BY count DESC LIMIT 10', (FACET_GENRE,))]
+        stats['db_bytes'] = sum(os.path.getsize(p) for p in (self.db_path, self.db_path + '-wal')
+                                if os.path.exists(p))
+        return stats
+
+    @timed('db.vacuum')
+    def vacuum(self):
+        cur = self.conn.cursor()
+        cur.execute('VACUUM')
+        self.conn.commit()
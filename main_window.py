@@ -1,31 +1,46 @@
 # main_window.py
 # -*- coding: utf-8 -*-
 from PyQt5 import QtWidgets, QtCore, QtGui
-import sqlite3
 import os
-import random
+import sys
 import subprocess
 import shutil
+import sqlite3
+import threading
+import queue
+import re
+import json
 import time
-import tempfile
-import urllib.request
-from pathlib import Path
-import xml.etree.ElementTree as ET
-import csv
 
-# DB nella stessa cartella del codice
-DB_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'videos.db')
-VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv']
+from db_manager import DBManager, EXPORT_FORMATS, ROLE_DIRECTOR, ROLE_ACTOR, FACET_GENRE, FACET_YEAR
+from nfo_parser import NFOParser
+from scanner import LibraryScanner, SCAN_WORKERS, drop_unreachable
+from poster_cache import PosterCache
+from playlist import (default_playlist_path, export_playlist, generate_playlist, regenerate_playlist, save_playlist,
+                      RECENT_DAYS)
+from perfstats import perf, timed, timer, PERF_LOG_FILENAME
+from watcher import (PollingWatcher, changes_to_targets, is_network_path, list_directories,
+                     WATCH_DEBOUNCE_SECONDS, POLL_INTERVAL_SECONDS, LOCAL_POLL_INTERVAL_SECONDS)
+
+EXPORT_FILE_FILTER = 'CSV (*.csv);;CSV gzip (*.csv.gz);;JSON Lines (*.jsonl);;JSON Lines gzip (*.jsonl.gz)'
+# cache in memoria delle locandine già scalate (KB, QPixmapCache)
+PIXMAP_CACHE_KB = 64 * 1024
+# caricamento asincrono: download/decodifiche in parallelo
+POSTER_WORKERS = 4
+# attesa massima dei download in corso alla chiusura (secondi)
+POSTER_SHUTDOWN_SECONDS = 10
+# pausa dopo l'ultimo clic sui filtri prima di rifare la query (ms)
+FILTER_DEBOUNCE_MS = 250
 
 
 # --------------------------- Dialog di progresso ---------------------------
 class ProgressDialog(QtWidgets.QDialog):
     cancel_requested = QtCore.pyqtSignal()
 
-    def __init__(self, parent=None, maximum=100):
+    def __init__(self, parent=None, maximum=100, modal=True):
         super().__init__(parent)
         self.setWindowTitle("Processing")
-        self.setModal(True)
+        self.setModal(modal)
         self.canceled = False
         layout = QtWidgets.QVBoxLayout(self)
         self.label = QtWidgets.QLabel("Processing files...")
@@ -38,223 +53,599 @@ class ProgressDialog(QtWidgets.QDialog):
         layout.addWidget(self.cancel_btn)
         self.resize(420, 140)
 
-    def update_progress(self, value):
+    def update_progress(self, value, maximum=None, text=None):
+        # il lavoro gira in un thread separato: qui si aggiorna solo la UI, niente processEvents()
+        if maximum is not None:
+            self.progress_bar.setMaximum(maximum)
+        if text is not None:
+            self.label.setText(text)
         self.progress_bar.setValue(value)
-        QtWidgets.QApplication.processEvents()
 
     def cancel(self):
-        self.canceled = True
-        self.cancel_requested.emit()
+        if not self.canceled:
+            self.canceled = True
+            self.label.setText("Annullamento in corso…")
+            self.cancel_btn.setEnabled(False)
+            self.cancel_requested.emit()
 
+    def reject(self):
+        # Esc / chiusura finestra = annulla; il dialog viene chiuso da chi ha avviato il lavoro
+        self.cancel()
 
-# --------------------------- Gestore DB ---------------------------
-class DBManager:
-    """Database helper per la tabella `videos`."""
 
-    def __init__(self, db_path: str = DB_FILENAME):
+# --------------------------- Scansione in background ---------------------------
+class ScanWorker(QtCore.QObject):
+    """
+    Esegue LibraryScanner in un QThread con una connessione al DB propria: scansione completa di
+    `folder` oppure, con `targets`, solo le cartelle segnalate dal monitoraggio.
+    """
+    progress = QtCore.pyqtSignal(dict)
+    finished = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, db_path, folder=None, incremental=True, workers=SCAN_WORKERS, targets=None):
+        super().__init__()
         self.db_path = db_path
-        # isolation_level=None => autocommit disattivato, usiamo commit manuale
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self._ensure_schema()
-
-    def _ensure_schema(self):
-        cur = self.conn.cursor()
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS videos (
-                id INTEGER PRIMARY KEY,
-                path TEXT UNIQUE,
-                mtime REAL,
-                genres TEXT,
-                year TEXT,
-                directors TEXT,
-                plot TEXT,
-                actors TEXT,
-                duration TEXT,
-                rating TEXT,
-                poster TEXT
-            )
-        ''')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_path ON videos(path)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_year ON videos(year)')
-        cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_directors ON videos(directors)')
-        self.conn.commit()
-
-    def close(self):
+        self.folder = folder
+        self.targets = targets
+        self.incremental = incremental
+        self.workers = workers
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        # chiamato dal thread della GUI: il flag viene letto dallo scanner tra un lotto e l'altro
+        self._cancel.set()
+
+    def run(self):
+        db = None
         try:
-            self.conn.commit()
-            self.conn.close()
-        except Exception:
-            pass
+            db = DBManager(self.db_path)
+            scanner = LibraryScanner(db, workers=self.workers, cancel_event=self._cancel)
+            if self.targets is not None:
+                stats = scanner.update(self.targets, incremental=self.incremental, progress=self.progress.emit)
+            else:
+                stats = scanner.scan(self.folder, incremental=self.incremental, progress=self.progress.emit)
+            self.finished.emit(stats)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.close()
 
-    # CRUD minimi usati dall’app
-    def add_or_update_video(self, path, mtime, genres, year, directors, plot, actors, duration, rating, poster):
-        cur = self.conn.cursor()
-        cur.execute('''INSERT OR REPLACE INTO videos(path, mtime, genres, year, directors, plot, actors, duration, rating, poster)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (path, mtime, genres, year, directors, plot, actors, duration, rating, poster))
-        self.conn.commit()
-
-    def _split_serialized(self, s: str):
-        if not s:
-            return []
-        if '|' in s:
-            parts = [p.strip() for p in s.split('|') if p.strip()]
-        else:
-            parts = [p.strip() for p in s.split(',') if p.strip()]
-        return parts
-
-    def get_all_genres(self):
-        cur = self.conn.cursor()
-        cur.execute('SELECT genres FROM videos WHERE genres IS NOT NULL AND genres != ""')
-        rows = cur.fetchall()
-        genres = set()
-        for row in rows:
-            g = row['genres']
-            if g:
-                genres.update(self._split_serialized(g))
-        return sorted(genres, key=lambda x: x.lower())
-
-    def get_all_years(self):
-        cur = self.conn.cursor()
-        cur.execute('SELECT DISTINCT year FROM videos WHERE year IS NOT NULL AND year != ""')
-        rows = cur.fetchall()
-        years = [row['year'] for row in rows if row['year']]
+
+class PruneWorker(QtCore.QObject):
+    """Confronta in un QThread il DB con le cartelle scansionate (LibraryScanner.prune)."""
+    finished = QtCore.pyqtSignal(dict)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, db_path, dry_run=True):
+        super().__init__()
+        self.db_path = db_path
+        self.dry_run = dry_run
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        db = None
         try:
-            years_num = sorted(set(years), key=lambda y: int(y), reverse=True)
-            return years_num
-        except Exception:
-            return sorted(set(years), key=lambda x: x, reverse=True)
-
-    def get_all_directors(self):
-        cur = self.conn.cursor()
-        cur.execute('SELECT directors FROM videos WHERE directors IS NOT NULL AND directors != ""')
-        rows = cur.fetchall()
-        directors = set()
-        for row in rows:
-            d = row['directors']
-            if d:
-                directors.update(self._split_serialized(d))
-        return sorted(directors, key=lambda x: x.lower())
-
-    def query_videos(self, genres=None, years=None, directors=None, limit=1000):
-        conditions = []
-        params = []
+            db = DBManager(self.db_path)
+            result = LibraryScanner(db, cancel_event=self._cancel).prune(dry_run=self.dry_run)
+            result['canceled'] = self._cancel.is_set()
+            self.finished.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.close()
 
-        if genres:
-            sub = ' OR '.join(['genres LIKE ?' for _ in genres])
-            conditions.append(f'({sub})')
-            params.extend([f'%{g}%' for g in genres])
 
-        if years:
-            placeholders = ','.join(['?'] * len(years))
-            conditions.append(f'year IN ({placeholders})')
-            params.extend(years)
+# --------------------------- Monitoraggio cartelle ---------------------------
+class LibraryWatcher(QtCore.QObject):
+    """
+    Segue le radici scansionate: QFileSystemWatcher (inotify) sui dischi locali, PollingWatcher in
+    un thread per i mount di rete o quando il limite di inotify è esaurito. Sui dischi locali un
+    secondo PollingWatcher, ogni LOCAL_POLL_INTERVAL_SECONDS, trova i file riscritti sul posto
+    che inotify sulle cartelle non segnala. Gli eventi vengono
+    accumulati finché non passano WATCH_DEBOUNCE_SECONDS senza novità, poi escono tutti insieme
+    da `changes_ready` come elenco di bersagli (cartella, ricorsivo) per LibraryScanner.update.
+    """
+    changes_ready = QtCore.pyqtSignal(list)
+    _polled = QtCore.pyqtSignal(list)
 
-        if directors:
-            sub = ' OR '.join(['directors LIKE ?' for _ in directors])
-            conditions.append(f'({sub})')
-            params.extend([f'%{d}%' for d in directors])
-
-        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
-        q = ("SELECT path, genres, year, directors, plot, actors, duration, rating, poster, mtime "
-             "FROM videos " + where + " ORDER BY path LIMIT ?")
-        params.append(limit)
-        cur = self.conn.cursor()
-        cur.execute(q, params)
-        return cur.fetchall()
-
-    # --- funzioni a supporto della finestra Gestione DB ---
-    def fetch_all(self, order_by="path"):
-        allowed = {"id", "path", "year", "mtime", "rating"}
-        order_clause = order_by if order_by in allowed else "path"
-        cur = self.conn.cursor()
-        cur.execute(f'''SELECT id, path, genres, year, directors, plot, actors, duration, rating, poster, mtime
-                        FROM videos
-                        ORDER BY {order_clause}''')
-        return cur.fetchall()
-
-    def delete_by_field_match(self, field: str, value: str, use_like: bool = True):
-        allowed = {"path", "genres", "year", "directors", "actors", "duration", "rating", "poster"}
-        if field not in allowed:
-            raise ValueError("Campo non valido")
-        cur = self.conn.cursor()
-        if use_like:
-            cur.execute(f'DELETE FROM videos WHERE {field} LIKE ?', (value,))
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.fs_watcher = QtCore.QFileSystemWatcher(self)
+        self.fs_watcher.directoryChanged.connect(self._on_directory_changed)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(WATCH_DEBOUNCE_SECONDS * 1000))
+        self.timer.timeout.connect(self._flush)
+        self._polled.connect(self._on_polled)
+        self._known = set()
+        self._changed_dirs = set()
+        self._polled_targets = []
+        self._poll_stop = None
+        self._poll_threads = []
+        self.local_roots = []
+        self.polled_roots = []
+
+    @property
+    def active(self):
+        return bool(self.local_roots or self.polled_roots)
+
+    def start(self, roots):
+        self.stop()
+        roots = [r for r in roots if os.path.isdir(r)]
+        self.local_roots = [r for r in roots if not is_network_path(r)]
+        self.polled_roots = [r for r in roots if r not in self.local_roots]
+        if self.local_roots:
+            dirs = list(list_directories(self.local_roots))
+            failed = set(self.fs_watcher.addPaths(dirs) or [])
+            self._known = set(dirs) - failed
+            if failed:
+                # inotify esaurito (fs.inotify.max_user_watches): quelle radici passano al polling
+                fallback = [r for r in self.local_roots
+                            if any(f == r or f.startswith(os.path.join(r, '')) for f in failed)]
+                self.local_roots = [r for r in self.local_roots if r not in fallback]
+                self.polled_roots += fallback
+        self._poll_stop = threading.Event()
+        for group, interval in ((self.polled_roots, POLL_INTERVAL_SECONDS),
+                                (self.local_roots, LOCAL_POLL_INTERVAL_SECONDS)):
+            if group:
+                thread = threading.Thread(target=self._poll_loop, daemon=True,
+                                          args=(list(group), self._poll_stop, interval))
+                thread.start()
+                self._poll_threads.append(thread)
+
+    def stop(self):
+        self.timer.stop()
+        watched = self.fs_watcher.directories()
+        if watched:
+            self.fs_watcher.removePaths(watched)
+        if self._poll_threads:
+            # niente join: una lettura su un mount di rete lento bloccherebbe la GUI
+            self._poll_stop.set()
+            self._poll_threads = []
+        self._known.clear()
+        self._changed_dirs.clear()
+        self._polled_targets = []
+        self.local_roots = []
+        self.polled_roots = []
+
+    def _poll_loop(self, roots, stop, interval):
+        poller = PollingWatcher(roots)
+        while not stop.wait(interval):
+            targets = poller.poll()
+            if targets and not stop.is_set():
+                self._polled.emit(targets)
+
+    def _on_directory_changed(self, path):
+        self._changed_dirs.add(path)
+        self.timer.start()
+
+    def _on_polled(self, targets):
+        self._polled_targets.extend(targets)
+        self.timer.start()
+
+    def _flush(self):
+        targets = changes_to_targets(self._changed_dirs, self._known) + self._polled_targets
+        self._changed_dirs = set()
+        self._polled_targets = []
+        # radice smontata o vuota: le sottocartelle sono irraggiungibili, non eliminate
+        targets, _ = drop_unreachable(targets, self.local_roots + self.polled_roots)
+        # l'insieme osservato segue l'albero: via le cartelle sparite, dentro quelle nuove
+        for folder, recursive in targets:
+            if not os.path.isdir(folder):
+                prefix = os.path.join(folder, '')
+                gone = [d for d in self._known if d == folder or d.startswith(prefix)]
+                if gone:
+                    self.fs_watcher.removePaths(gone)
+                    self._known.difference_update(gone)
+            elif recursive and any(folder.startswith(os.path.join(r, '')) for r in self.local_roots):
+                new = [d for d in list_directories([folder]) if d not in self._known]
+                if new:
+                    failed = set(self.fs_watcher.addPaths(new) or [])
+                    self._known.update(d for d in new if d not in failed)
+        if targets:
+            self.changes_ready.emit(targets)
+
+
+# --------------------------- Query dei filtri in background ---------------------------
+def all_facet_counts(db, filters):
+    """{tipo: {valore: conteggio}} di tutte le faccette ristrette ai filtri dati."""
+    return {kind: db.facet_counts(kind, **filters) for kind in (FACET_GENRE, FACET_YEAR, ROLE_DIRECTOR, ROLE_ACTOR)}
+
+
+class QueryRunner(QtCore.QObject):
+    """
+    Esegue `work(db, filters)` (default: DBManager.video_ids) in un thread con una connessione al
+    DB propria (e la sua cache). Conta solo l'ultima richiesta: una nuova `submit` interrompe
+    quella in corso tramite il progress handler di sqlite3, e `ready(request_id, risultato)`
+    arriva nel thread della GUI solo per la richiesta più recente.
+    """
+    ready = QtCore.pyqtSignal(int, object)
+    failed = QtCore.pyqtSignal(int, str)
+
+    def __init__(self, db_path, parent=None, work=None, name='filter-query'):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.work = work or (lambda db, filters: db.video_ids(**filters))
+        self._queue = queue.Queue()
+        self._latest = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, filters):
+        self._latest += 1
+        self._queue.put((self._latest, filters))
+        return self._latest
+
+    def shutdown(self):
+        self._latest += 1  # interrompe la query in corso
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        try:
+            db = DBManager(self.db_path)
+        except Exception as e:
+            self.failed.emit(0, str(e))
+            return
+        try:
+            while True:
+                job = self._queue.get()
+                if job is None:
+                    return
+                request_id, filters = job
+                if request_id != self._latest:
+                    continue  # superata da una richiesta arrivata nel frattempo
+                try:
+                    with db.interruptible(lambda: request_id != self._latest):
+                        result = self.work(db, filters)
+                except sqlite3.OperationalError as e:
+                    if request_id != self._latest:
+                        perf.count('query.canceled')
+                    else:
+                        self.failed.emit(request_id, str(e))
+                    continue
+                except Exception as e:
+                    self.failed.emit(request_id, str(e))
+                    continue
+                if request_id == self._latest:
+                    self.ready.emit(request_id, result)
+        finally:
+            db.close()
+
+
+# --------------------------- Modello tabella risultati ---------------------------
+class VideoTableModel(QtCore.QAbstractTableModel):
+    """
+    Righe dei video filtrati, lette a pagine per id: la vista chiede altre righe (fetchMore) solo
+    scorrendo. Gli id arrivano da DBManager.video_ids (in cache per combinazione di filtri).
+    """
+    HEADERS = ['Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating', 'Poster', 'MTime']
+    COLUMNS = ['path', 'genres', 'year', 'directors', 'plot', 'actors', 'duration', 'rating', 'poster', 'mtime']
+    PAGE_SIZE = 256
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._ids = ()
+        self._next = 0
+        self._fetch = None
+
+    def set_ids(self, ids, fetch):
+        """`fetch(ids)` ritorna le righe degli id dati (DBManager.get_videos_by_ids)."""
+        self.beginResetModel()
+        self._rows = []
+        self._ids = ids
+        self._next = 0
+        self._fetch = fetch
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.ToolTipRole):
+            return None
+        value = self._rows[index.row()][self.COLUMNS[index.column()]]
+        return '' if value is None else str(value)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self._next < len(self._ids)
+
+    @timed('ui.table_fetch')
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        page = self._ids[self._next:self._next + self.PAGE_SIZE]
+        self._next += len(page)
+        # un video eliminato dopo il calcolo degli id non ha più la riga: si salta
+        rows = [row for row in self._fetch(page) if row is not None]
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def row_dict(self, row):
+        return dict(self._rows[row])
+
+
+# --------------------------- Esportazione in background ---------------------------
+class ExportWorker(QtCore.QObject):
+    """Esegue DBManager.export_videos in un QThread con una connessione al DB propria."""
+    progress = QtCore.pyqtSignal(int, int)
+    finished = QtCore.pyqtSignal(int, bool)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, db_path, path, header=None):
+        super().__init__()
+        self.db_path = db_path
+        self.path = path
+        self.header = header
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        db = None
+        try:
+            db = DBManager(self.db_path)
+            count = db.export_videos(self.path, header=self.header, progress=self.progress.emit,
+                                     cancel_event=self._cancel)
+            self.finished.emit(count, self._cancel.is_set())
+        except Exception as e:
+            self.failed.emit(str(e))
+        finally:
+            if db is not None:
+                db.close()
+
+
+def ask_export_path(parent):
+    """Chiede il file di destinazione; aggiunge l'estensione del formato scelto se manca."""
+    path, selected = QtWidgets.QFileDialog.getSaveFileName(parent, 'Esporta', '', EXPORT_FILE_FILTER)
+    if path and not any(path.lower().endswith(ext) for ext in EXPORT_FORMATS):
+        path += re.search(r'\*(\.[\w.]+)\)', selected).group(1) if selected else '.csv'
+    return path
+
+
+def start_export(parent, db_path, path, header=None):
+    """Avvia l'export in background con dialog di avanzamento; il job resta legato a `parent`."""
+    worker = ExportWorker(db_path, path, header)
+    thread = QtCore.QThread(parent)
+    worker.moveToThread(thread)
+    dialog = ProgressDialog(parent, maximum=0, modal=False)
+    dialog.setWindowTitle('Esportazione')
+    dialog.label.setText(f'Esportazione in {os.path.basename(path)}…')
+    dialog.cancel_requested.connect(worker.cancel, QtCore.Qt.DirectConnection)
+
+    def on_progress(written, total):
+        if not dialog.canceled:
+            dialog.update_progress(written, maximum=max(total, 1), text=f'Esportati {written} di {total} record')
+
+    def cleanup():
+        thread.quit()
+        thread.wait()
+        dialog.close()
+        worker.deleteLater()
+        thread.deleteLater()
+        parent._export_job = None
+
+    def on_finished(count, canceled):
+        cleanup()
+        if canceled:
+            QtWidgets.QMessageBox.information(parent, 'Esporta', 'Esportazione annullata.')
         else:
-            cur.execute(f'DELETE FROM videos WHERE {field} = ?', (value,))
-        count = cur.rowcount
-        self.conn.commit()
-        return count
+            QtWidgets.QMessageBox.information(parent, 'Esporta', f'Esportati {count} record in {path}')
+
+    def on_failed(message):
+        cleanup()
+        QtWidgets.QMessageBox.warning(parent, 'Errore', f'Impossibile esportare: {message}')
+
+    worker.progress.connect(on_progress)
+    worker.finished.connect(on_finished)
+    worker.failed.connect(on_failed)
+    thread.started.connect(worker.run)
+    parent._export_job = (thread, worker, dialog)
+    dialog.show()
+    thread.start()
+
+
+def stop_export(parent):
+    """Annulla e attende l'export legato a `parent` (chiusura della finestra)."""
+    job = getattr(parent, '_export_job', None)
+    if job:
+        thread, worker, dialog = job
+        # la finestra sta per chiudersi: niente messaggi di fine export
+        for signal in (worker.progress, worker.finished, worker.failed):
+            signal.disconnect()
+        worker.cancel()
+        thread.quit()
+        thread.wait()
+        dialog.close()
+        parent._export_job = None
+
+
+# --------------------------- Locandine asincrone ---------------------------
+def poster_pixmap_key(poster, size):
+    return f'poster:{size.width()}x{size.height()}:{poster}'
+
+
+def load_poster_image(poster, size, cache):
+    """QImage della locandina scalata a `size` (utilizzabile fuori dal thread della GUI); None se assente."""
+    if not poster:
+        return None
+    if os.path.exists(poster):
+        local = poster
+    elif PosterCache.is_remote(poster):
+        local = cache.get(poster)
+    else:
+        local = None
+    if not local:
+        return None
+    with timer('poster.decode'):
+        image = QtGui.QImage(local)
+        if image.isNull():
+            return None
+        return image.scaled(size, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+
+
+class _PosterTask(QtCore.QRunnable):
+    def __init__(self, loader, request_id, poster, size):
+        super().__init__()
+        self.setAutoDelete(False)  # il riferimento resta al loader finché il risultato non è consegnato
+        self.loader = loader
+        self.request_id = request_id
+        self.poster = poster
+        self.size = size
 
-    def delete_ids(self, ids):
-        if not ids:
-            return 0
-        cur = self.conn.cursor()
-        placeholders = ','.join(['?'] * len(ids))
-        cur.execute(f'DELETE FROM videos WHERE id IN ({placeholders})', ids)
-        count = cur.rowcount
-        self.conn.commit()
-        return count
-
-    def vacuum(self):
-        cur = self.conn.cursor()
-        cur.execute('VACUUM')
-        self.conn.commit()
-
-
-# --------------------------- Parser NFO ---------------------------
-class NFOParser:
-    """Legge generi, anno, registi, trama, runtime, rating, poster/thumb, attori dai .nfo."""
-
-    def _get_actor_names(self, root):
-        names = []
-        for a in root.findall('actor'):
-            name = a.findtext('name') or a.findtext('actor') or a.text
-            if name and name.strip():
-                names.append(name.strip())
-        for a in root.findall('actors'):
-            for child in a:
-                if child.text and child.text.strip():
-                    names.append(child.text.strip())
-        return names
-
-    def parse_video_info(self, nfo_path):
+    def run(self):
         try:
-            tree = ET.parse(nfo_path)
-            root = tree.getroot()
-            genres = [g.text.strip() for g in root.findall('genre') if g.text]
-            genres_s = '|'.join(genres)
-            year = root.findtext('year', '').strip()
-            directors = [d.text.strip() for d in root.findall('director') if d.text]
-            directors_s = '|'.join(directors)
-            plot = root.findtext('plot', '').strip()
-            actors_list = self._get_actor_names(root)
-            actors_s = '|'.join(actors_list)
-            duration = (root.findtext('runtime', '') or root.findtext('duration', '') or '').strip()
-            rating = (root.findtext('rating', '') or '').strip()
-            poster = ''
-            for tag in ('thumb', 'poster', 'fanart'):
-                v = root.findtext(tag)
-                if v and v.strip():
-                    poster = v.strip()
-                    break
-            if not poster:
-                f = root.find('fanart')
-                if f is not None:
-                    t = f.findtext('thumb') or f.findtext('poster')
-                    if t and t.strip():
-                        poster = t.strip()
-            return genres_s, year, directors_s, plot, actors_s, duration, rating, poster
+            image = load_poster_image(self.poster, self.size, self.loader.cache)
         except Exception as e:
-            print(f"Error parsing {nfo_path}: {e}")
-            return '', '', '', '', '', '', '', ''
+            print(f"Poster load failed {self.poster}: {e}")
+            image = None
+        self.loader._done.emit(self.request_id, image)
+
+
+class PosterLoader(QtCore.QObject):
+    """
+    Carica le locandine in un pool di thread limitato; `ready(request_id, pixmap)` arriva nel
+    thread della GUI (pixmap None se non disponibile). Le pixmap scalate finiscono in QPixmapCache.
+    """
+    ready = QtCore.pyqtSignal(int, object)
+    _done = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, cache, parent=None, workers=POSTER_WORKERS):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(workers)
+        self._tasks = {}
+        self._canceled = set()
+        self._next_id = 0
+        self._done.connect(self._on_done)
+
+    def cached(self, poster, size):
+        return QtGui.QPixmapCache.find(poster_pixmap_key(poster, size))
+
+    def request(self, poster, size):
+        """Accoda il caricamento e ritorna l'id della richiesta."""
+        self._next_id += 1
+        task = _PosterTask(self, self._next_id, poster, QtCore.QSize(size))
+        self._tasks[self._next_id] = task
+        self.pool.start(task)
+        return self._next_id
+
+    def cancel(self, request_ids):
+        """Le richieste non ancora partite escono dalla coda; quelle in corso vengono ignorate."""
+        for rid in request_ids:
+            task = self._tasks.get(rid)
+            if task is None:
+                continue
+            if self.pool.tryTake(task):
+                del self._tasks[rid]
+            else:
+                self._canceled.add(rid)
+
+    def shutdown(self):
+        self.cancel(list(self._tasks))
+        self.pool.waitForDone(POSTER_SHUTDOWN_SECONDS * 1000)
+
+    def _on_done(self, request_id, image):
+        task = self._tasks.pop(request_id, None)
+        pix = None
+        if image is not None:
+            pix = QtGui.QPixmap.fromImage(image)
+            if task is not None:
+                QtGui.QPixmapCache.insert(poster_pixmap_key(task.poster, task.size), pix)
+        if request_id in self._canceled:
+            self._canceled.discard(request_id)
+            return
+        self.ready.emit(request_id, pix)
+
+
+# --------------------------- Dialog opzioni playlist ---------------------------
+class PlaylistOptionsDialog(QtWidgets.QDialog):
+    """Parametri di generate_playlist: numero di titoli o durata totale, rating e varietà."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Crea playlist')
+        form = QtWidgets.QFormLayout(self)
+        self.count_spin = QtWidgets.QSpinBox()
+        self.count_spin.setRange(1, 1000)
+        self.count_spin.setValue(5)
+        form.addRow('Numero di file:', self.count_spin)
+
+        self.budget_check = QtWidgets.QCheckBox('Durata totale')
+        self.budget_edit = QtWidgets.QTimeEdit(QtCore.QTime(3, 0))
+        self.budget_edit.setDisplayFormat('H:mm')
+        self.budget_edit.setMinimumTime(QtCore.QTime(0, 10))
+        self.budget_edit.setEnabled(False)
+        self.budget_check.toggled.connect(self.budget_edit.setEnabled)
+        self.budget_check.toggled.connect(self.count_spin.setDisabled)
+        form.addRow(self.budget_check, self.budget_edit)
+
+        self.weight_check = QtWidgets.QCheckBox('Preferisci i titoli con rating alto')
+        form.addRow(self.weight_check)
+
+        self.recent_spin = QtWidgets.QSpinBox()
+        self.recent_spin.setRange(0, 365)
+        self.recent_spin.setValue(RECENT_DAYS)
+        self.recent_spin.setSuffix(' giorni')
+        self.recent_spin.setSpecialValueText('nessuna')
+        form.addRow('Escludi già proposti negli ultimi:', self.recent_spin)
+
+        self.director_spin = QtWidgets.QSpinBox()
+        self.director_spin.setRange(0, 100)
+        self.director_spin.setSpecialValueText('nessun limite')
+        form.addRow('Massimo per regista:', self.director_spin)
+        self.genre_spin = QtWidgets.QSpinBox()
+        self.genre_spin.setRange(0, 1000)
+        self.genre_spin.setSpecialValueText('nessun limite')
+        form.addRow('Massimo per genere:', self.genre_spin)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        form.addRow(btns)
+
+    def options(self):
+        budget = None
+        if self.budget_check.isChecked():
+            t = self.budget_edit.time()
+            budget = t.hour() * 3600 + t.minute() * 60
+        return {'count': None if budget else self.count_spin.value(),
+                'budget_seconds': budget,
+                'weight_by_rating': self.weight_check.isChecked(),
+                'recent_days': self.recent_spin.value(),
+                'max_per_director': self.director_spin.value() or None,
+                'max_per_genre': self.genre_spin.value() or None}
 
 
 # --------------------------- Dialog locandine playlist ---------------------------
 class PlaylistPosterDialog(QtWidgets.QDialog):
-    def __init__(self, parent, items):
+    def __init__(self, parent, items, poster_loader=None):
         super().__init__(parent)
+        self.poster_loader = poster_loader or PosterLoader(PosterCache(), self)
+        self.poster_loader.ready.connect(self._on_poster_ready)
+        self._pending = {}  # id richiesta -> etichetta in attesa della locandina
         self.setWindowTitle('Playlist - Locandina')
         self.resize(900, 650)
         layout = QtWidgets.QVBoxLayout(self)
@@ -270,20 +661,8 @@ class PlaylistPosterDialog(QtWidgets.QDialog):
             poster_label = QtWidgets.QLabel()
             poster_label.setFixedSize(150, 225)
             poster_label.setStyleSheet('border:1px solid #ccc; background:#000')
-            pix = None
-            poster = it.get('poster') or ''
-            if poster and os.path.exists(poster):
-                pix = QtGui.QPixmap(poster)
-            elif poster:
-                try:
-                    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(poster)[1] if '.' in poster else '.img')
-                    tmp.close()
-                    urllib.request.urlretrieve(poster, tmp.name)
-                    pix = QtGui.QPixmap(tmp.name)
-                except Exception:
-                    pix = None
-            if pix and not pix.isNull():
-                poster_label.setPixmap(pix.scaled(poster_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
+            poster_label.setAlignment(QtCore.Qt.AlignCenter)
+            self._show_poster(poster_label, it.get('poster') or '')
             h.addWidget(poster_label)
 
             info_w = QtWidgets.QWidget()
@@ -323,6 +702,161 @@ class PlaylistPosterDialog(QtWidgets.QDialog):
         btns.rejected.connect(self.reject)
         layout.addWidget(btns)
 
+    def _show_poster(self, label, poster):
+        if not poster:
+            return
+        pix = self.poster_loader.cached(poster, label.size())
+        if pix is not None:
+            label.setPixmap(pix)
+            return
+        # segnaposto subito, la locandina arriva quando il worker ha finito
+        label.setText('<span style="color:#888">Caricamento…</span>')
+        self._pending[self.poster_loader.request(poster, label.size())] = label
+
+    def _on_poster_ready(self, request_id, pix):
+        label = self._pending.pop(request_id, None)
+        if label is None:
+            return
+        if pix is not None:
+            label.setPixmap(pix)
+        else:
+            label.setText('<span style="color:#888">Nessuna locandina</span>')
+
+    def done(self, result):
+        self.poster_loader.cancel(list(self._pending))
+        self._pending.clear()
+        self.poster_loader.ready.disconnect(self._on_poster_ready)
+        super().done(result)
+
+
+# --------------------------- Dialog playlist salvate ---------------------------
+def format_seconds(seconds):
+    if not seconds:
+        return ''
+    return f'{int(seconds) // 3600}:{int(seconds) % 3600 // 60:02d}'
+
+
+class SavedPlaylistsDialog(QtWidgets.QDialog):
+    """Playlist salvate nel DB: locandine, riproduzione, export M3U, rigenerazione, eliminazione."""
+    HEADERS = ['Nome', 'Titoli', 'Durata', 'Creata', 'File M3U']
+
+    def __init__(self, browser):
+        super().__init__(browser)
+        self.browser = browser
+        self.db = browser.db
+        self.setWindowTitle('Playlist salvate')
+        self.resize(820, 420)
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.doubleClicked.connect(self.show_posters)
+        layout.addWidget(self.table)
+
+        btn_layout = QtWidgets.QHBoxLayout()
+        for text, slot in (('Locandine', self.show_posters), ('Riproduci', self.play),
+                           ('Esporta M3U…', self.export), ('Rigenera', self.regenerate), ('Elimina', self.delete)):
+            btn = QtWidgets.QPushButton(text)
+            btn.clicked.connect(slot)
+            btn_layout.addWidget(btn)
+        btn_layout.addStretch(1)
+        layout.addLayout(btn_layout)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+        self._playlists = []
+        self.reload()
+
+    def reload(self):
+        try:
+            self._playlists = self.db.get_playlists()
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore caricamento playlist: {e}')
+            self._playlists = []
+        self.table.setRowCount(len(self._playlists))
+        for r, p in enumerate(self._playlists):
+            created = QtCore.QDateTime.fromSecsSinceEpoch(int(p['created'])).toString('yyyy-MM-dd HH:mm')
+            for c, value in enumerate((p['name'], str(p['items']), format_seconds(p['seconds']), created,
+                                       p['m3u_path'] or '')):
+                self.table.setItem(r, c, QtWidgets.QTableWidgetItem(value))
+        self.table.resizeColumnsToContents()
+
+    def _selected(self):
+        rows = self.table.selectionModel().selectedRows()
+        if not rows:
+            QtWidgets.QMessageBox.information(self, 'Playlist', 'Nessuna playlist selezionata.')
+            return None
+        return self._playlists[rows[0].row()]
+
+    def show_posters(self):
+        playlist = self._selected()
+        if playlist is not None:
+            self.browser.show_playlist(playlist['id'])
+
+    def play(self):
+        playlist = self._selected()
+        if playlist is None:
+            return
+        path = playlist['m3u_path'] or default_playlist_path()
+        try:
+            export_playlist(self.db, playlist['id'], path)
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'Errore', f'Non posso scrivere la playlist: {e}')
+            return
+        self.reload()
+        self.browser.play_m3u(path)
+
+    def export(self):
+        playlist = self._selected()
+        if playlist is None:
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Esporta playlist', playlist['m3u_path'] or
+                                                        default_playlist_path(), 'Playlist M3U (*.m3u *.m3u8)')
+        if not path:
+            return
+        try:
+            count = export_playlist(self.db, playlist['id'], path)
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'Errore', f'Non posso scrivere la playlist: {e}')
+            return
+        self.reload()
+        QtWidgets.QMessageBox.information(self, 'Playlist', f'Scritte {count} voci in {path}')
+
+    def regenerate(self):
+        playlist = self._selected()
+        if playlist is None:
+            return
+        if QtWidgets.QMessageBox.question(self, 'Conferma', f"Sostituire i titoli di «{playlist['name']}» con una "
+                                          f"nuova estrazione?") != QtWidgets.QMessageBox.Yes:
+            return
+        try:
+            chosen = regenerate_playlist(self.db, playlist['id'])
+            self.db.record_plays([row['id'] for row in chosen])
+            if playlist['m3u_path']:
+                export_playlist(self.db, playlist['id'], playlist['m3u_path'])
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'Errore', f'Rigenerazione non riuscita: {e}')
+            return
+        self.reload()
+
+    def delete(self):
+        playlist = self._selected()
+        if playlist is None:
+            return
+        if QtWidgets.QMessageBox.question(self, 'Conferma',
+                                          f"Eliminare la playlist «{playlist['name']}»?") != QtWidgets.QMessageBox.Yes:
+            return
+        try:
+            self.db.delete_playlist(playlist['id'])
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'Errore', f'Impossibile eliminare: {e}')
+        self.reload()
+
 
 # --------------------------- Dialog gestione DB ---------------------------
 class DBManagementDialog(QtWidgets.QDialog):
@@ -333,6 +867,11 @@ class DBManagementDialog(QtWidgets.QDialog):
       - Esporta CSV
       - VACUUM
     """
+    HEADERS = ['ID', 'Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating', 'Poster', 'MTime']
+    # colonna -> campo ordinabile sul DB (None = non ordinabile)
+    SORT_COLUMNS = ['id', 'path', None, 'year', None, None, None, None, 'rating', None, 'mtime']
+    PAGE_SIZE = 200
+
     def __init__(self, db: DBManager, parent=None):
         super().__init__(parent)
         self.db = db
@@ -355,9 +894,13 @@ class DBManagementDialog(QtWidgets.QDialog):
         del_sel_btn = QtWidgets.QPushButton("Elimina selezionati")
         del_sel_btn.clicked.connect(self.delete_selected)
 
-        export_btn = QtWidgets.QPushButton("Esporta CSV…")
+        export_btn = QtWidgets.QPushButton("Esporta CSV/JSONL…")
         export_btn.clicked.connect(self.export_csv)
 
+        prune_btn = QtWidgets.QPushButton("Rimuovi orfani…")
+        prune_btn.setToolTip("Video nel DB non più presenti nelle cartelle scansionate")
+        prune_btn.clicked.connect(self.prune_orphans)
+
         vacuum_btn = QtWidgets.QPushButton("VACUUM")
         vacuum_btn.clicked.connect(self.do_vacuum)
 
@@ -374,29 +917,93 @@ class DBManagementDialog(QtWidgets.QDialog):
         cmd.addWidget(del_sel_btn)
         cmd.addStretch(1)
         cmd.addWidget(export_btn)
+        cmd.addWidget(prune_btn)
         cmd.addWidget(vacuum_btn)
         cmd.addWidget(refresh_btn)
 
         layout.addLayout(cmd)
 
-        # Tabella
+        # Tabella (una pagina alla volta, ordinamento sul DB cliccando le intestazioni)
         self.table = QtWidgets.QTableWidget()
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.table.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.table.setColumnCount(len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        header = self.table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.sectionClicked.connect(self.sort_by_column)
         layout.addWidget(self.table, 1)
 
+        # Navigazione pagine
+        nav = QtWidgets.QHBoxLayout()
+        self.first_btn = QtWidgets.QPushButton("⏮ Inizio")
+        self.first_btn.clicked.connect(self.first_page)
+        self.prev_btn = QtWidgets.QPushButton("◀ Precedente")
+        self.prev_btn.clicked.connect(self.prev_page)
+        self.next_btn = QtWidgets.QPushButton("Successiva ▶")
+        self.next_btn.clicked.connect(self.next_page)
+        self.page_label = QtWidgets.QLabel()
+        nav.addWidget(self.first_btn)
+        nav.addWidget(self.prev_btn)
+        nav.addWidget(self.next_btn)
+        nav.addSpacing(12)
+        nav.addWidget(self.page_label, 1)
+        layout.addLayout(nav)
+
         # Pulsanti fondo
         btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
         btns.rejected.connect(self.reject)
         layout.addWidget(btns)
 
+        self.order_by = "path"
+        self.descending = False
+        # chiavi (valore, id) da cui parte ogni pagina visitata: l'ultima è la pagina corrente
+        self._anchors = [None]
+        self._rows = []
+        self._update_sort_indicator()
+        self.load_table()
+
+    def _update_sort_indicator(self):
+        column = self.SORT_COLUMNS.index(self.order_by) if self.order_by in self.SORT_COLUMNS else -1
+        order = QtCore.Qt.DescendingOrder if self.descending else QtCore.Qt.AscendingOrder
+        self.table.horizontalHeader().setSortIndicator(column, order)
+
+    def sort_by_column(self, column):
+        field = self.SORT_COLUMNS[column]
+        if field is None:
+            self._update_sort_indicator()
+            return
+        self.descending = (not self.descending) if field == self.order_by else False
+        self.order_by = field
+        self._update_sort_indicator()
+        self.first_page()
+
+    def first_page(self):
+        self._anchors = [None]
+        self.load_table()
+
+    def next_page(self):
+        if len(self._rows) < self.PAGE_SIZE:
+            return
+        last = self._rows[-1]
+        self._anchors.append((last['sort_key'], last['id']))
         self.load_table()
 
+    def prev_page(self):
+        if len(self._anchors) > 1:
+            self._anchors.pop()
+            self.load_table()
+
     def load_table(self):
-        rows = self.db.fetch_all(order_by="path")
-        headers = ['ID', 'Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating', 'Poster', 'MTime']
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
+        """Ricarica solo la pagina corrente (anche dopo un'eliminazione)."""
+        rows = self.db.fetch_page(self.order_by, self.descending, after=self._anchors[-1], limit=self.PAGE_SIZE)
+        if not rows and len(self._anchors) > 1:
+            # pagina svuotata dalle eliminazioni: torno alla precedente
+            self._anchors.pop()
+            rows = self.db.fetch_page(self.order_by, self.descending, after=self._anchors[-1], limit=self.PAGE_SIZE)
+        self._rows = rows
+        self.table.clearContents()
         self.table.setRowCount(len(rows))
         for r, row in enumerate(rows):
             self.table.setItem(r, 0, QtWidgets.QTableWidgetItem(str(row['id'])))
@@ -412,6 +1019,17 @@ class DBManagementDialog(QtWidgets.QDialog):
             self.table.setItem(r, 10, QtWidgets.QTableWidgetItem(str(row['mtime']) if row['mtime'] is not None else ''))
         self.table.resizeColumnsToContents()
 
+        total = self.db.count_videos()
+        page = len(self._anchors)
+        start = (page - 1) * self.PAGE_SIZE
+        if rows:
+            self.page_label.setText(f"Pagina {page} · righe {start + 1}–{start + len(rows)} di {total}")
+        else:
+            self.page_label.setText(f"Nessun record (totale {total})")
+        self.prev_btn.setEnabled(page > 1)
+        self.first_btn.setEnabled(page > 1)
+        self.next_btn.setEnabled(len(rows) == self.PAGE_SIZE)
+
     def _selected_ids(self):
         ids = set()
         for it in self.table.selectedItems():
@@ -465,21 +1083,76 @@ class DBManagementDialog(QtWidgets.QDialog):
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, "Errore", f"Impossibile eliminare: {e}")
 
-    def export_csv(self):
-        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Salva CSV', '', 'CSV Files (*.csv)')
-        if not path:
+    def prune_orphans(self):
+        if not self.db.get_scan_roots():
+            QtWidgets.QMessageBox.information(self, "Info", "Nessuna cartella scansionata da controllare.")
+            return
+        # prima solo l'anteprima: l'elenco delle cartelle su un NAS può richiedere un po'
+        worker = PruneWorker(self.db.db_path, dry_run=True)
+        thread = QtCore.QThread(self)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        progress = ProgressDialog(self, maximum=0)
+        progress.setWindowTitle("Rimuovi orfani")
+        progress.label.setText("Confronto del DB con le cartelle scansionate…")
+        progress.cancel_requested.connect(worker.cancel, QtCore.Qt.DirectConnection)
+
+        def cleanup():
+            thread.quit()
+            thread.wait()
+            thread.deleteLater()
+            worker.deleteLater()
+            progress.done(0)
+
+        def on_finished(result):
+            cleanup()
+            if not result['canceled']:
+                self._confirm_prune(result)
+
+        def on_failed(message):
+            cleanup()
+            QtWidgets.QMessageBox.warning(self, "Errore", f"Controllo fallito: {message}")
+
+        worker.finished.connect(on_finished)
+        worker.failed.connect(on_failed)
+        thread.start()
+        progress.exec_()
+
+    def _confirm_prune(self, result):
+        orphans = result['orphans']
+        skipped = ''
+        if result['skipped']:
+            skipped = "\n\nCartelle non raggiungibili (saltate):\n" + '\n'.join(result['skipped'])
+        if not orphans:
+            QtWidgets.QMessageBox.information(self, "Rimuovi orfani",
+                                              "Nessun video orfano: il DB corrisponde alle cartelle." + skipped)
             return
+        if QtWidgets.QMessageBox.question(self, "Conferma",
+                                          f"{len(orphans)} video nel DB non sono più presenti su disco "
+                                          f"({len(result['roots'])} cartelle controllate). "
+                                          f"Eliminarli?" + skipped) != QtWidgets.QMessageBox.Yes:
+            return
+        QtWidgets.QApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
         try:
-            rows = self.db.fetch_all(order_by="path")
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                w = csv.writer(f)
-                w.writerow(['id', 'path', 'genres', 'year', 'directors', 'plot', 'actors', 'duration', 'rating', 'poster', 'mtime'])
-                for r in rows:
-                    w.writerow([r['id'], r['path'], r['genres'], r['year'], r['directors'], r['plot'],
-                                r['actors'], r['duration'], r['rating'], r['poster'], r['mtime']])
-            QtWidgets.QMessageBox.information(self, "Esporta", f"Esportati {len(rows)} record in {path}")
+            count = self.db.delete_paths(orphans)
         except Exception as e:
-            QtWidgets.QMessageBox.warning(self, "Errore", f"Impossibile esportare: {e}")
+            QtWidgets.QMessageBox.warning(self, "Errore", f"Impossibile eliminare: {e}")
+            return
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        self.load_table()
+        QtWidgets.QMessageBox.information(self, "Eliminazione", f"Eliminati {count} record.")
+
+    def export_csv(self):
+        if getattr(self, '_export_job', None):
+            return
+        path = ask_export_path(self)
+        if path:
+            start_export(self, self.db.db_path, path)
+
+    def done(self, result):
+        stop_export(self)
+        super().done(result)
 
     def do_vacuum(self):
         try:
@@ -489,15 +1162,176 @@ class DBManagementDialog(QtWidgets.QDialog):
             QtWidgets.QMessageBox.warning(self, "Errore", f"VACUUM fallito: {e}")
 
 
+# --------------------------- Dialog statistiche ---------------------------
+class StatsDialog(QtWidgets.QDialog):
+    """Tempi (istogrammi di latenza) e contatori raccolti da perfstats, aggiornati ogni secondo."""
+    TIMER_HEADERS = ['Operazione', 'Chiamate', 'Totale ms', 'Media ms', 'p50 ms', 'p95 ms', 'Max ms']
+    TIMER_FIELDS = ['count', 'total_ms', 'avg_ms', 'p50_ms', 'p95_ms', 'max_ms']
+    REFRESH_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Statistiche')
+        self._snapshot = {'timers': {}, 'counters': {}}
+        layout = QtWidgets.QVBoxLayout(self)
+
+        self.timer_table = QtWidgets.QTableWidget(0, len(self.TIMER_HEADERS))
+        self.timer_table.setHorizontalHeaderLabels(self.TIMER_HEADERS)
+        self.timer_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.timer_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.timer_table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.timer_table.verticalHeader().setVisible(False)
+        self.timer_table.itemSelectionChanged.connect(self._show_histogram)
+        layout.addWidget(QtWidgets.QLabel('Tempi'))
+        layout.addWidget(self.timer_table, 3)
+
+        self.histogram = QtWidgets.QPlainTextEdit()
+        self.histogram.setReadOnly(True)
+        self.histogram.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        layout.addWidget(QtWidgets.QLabel("Distribuzione dei tempi dell'operazione selezionata"))
+        layout.addWidget(self.histogram, 2)
+
+        self.counter_table = QtWidgets.QTableWidget(0, 2)
+        self.counter_table.setHorizontalHeaderLabels(['Contatore', 'Valore'])
+        self.counter_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.counter_table.verticalHeader().setVisible(False)
+        layout.addWidget(QtWidgets.QLabel('Contatori'))
+        layout.addWidget(self.counter_table, 1)
+
+        log_layout = QtWidgets.QHBoxLayout()
+        self.log_check = QtWidgets.QCheckBox('Registra su file le operazioni più lente di')
+        self.log_check.setChecked(bool(perf.log_path))
+        self.log_check.toggled.connect(self.toggle_log)
+        self.slow_spin = QtWidgets.QSpinBox()
+        self.slow_spin.setRange(1, 600000)
+        self.slow_spin.setSuffix(' ms')
+        self.slow_spin.setValue(int(perf.slow_ms))
+        self.slow_spin.valueChanged.connect(lambda v: setattr(perf, 'slow_ms', v))
+        self.log_label = QtWidgets.QLabel(perf.log_path or '')
+        self.log_label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        log_layout.addWidget(self.log_check)
+        log_layout.addWidget(self.slow_spin)
+        log_layout.addWidget(self.log_label, 1)
+        layout.addLayout(log_layout)
+
+        btns = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Close)
+        refresh_btn = btns.addButton('Aggiorna', QtWidgets.QDialogButtonBox.ActionRole)
+        refresh_btn.clicked.connect(self.refresh)
+        reset_btn = btns.addButton('Azzera', QtWidgets.QDialogButtonBox.ResetRole)
+        reset_btn.clicked.connect(self.reset)
+        save_btn = btns.addButton('Salva JSON…', QtWidgets.QDialogButtonBox.ActionRole)
+        save_btn.clicked.connect(self.save_json)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.resize(760, 640)
+        self.refresh()
+
+    def showEvent(self, event):
+        self.refresh_timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    @staticmethod
+    def _item(value):
+        item = QtWidgets.QTableWidgetItem()
+        # numeri come dati, non testo: l'ordinamento per colonna resta numerico
+        item.setData(QtCore.Qt.DisplayRole, round(value, 2) if isinstance(value, float) else value)
+        return item
+
+    def refresh(self):
+        self._snapshot = perf.snapshot()
+        selected = self._selected_timer()
+        table = self.timer_table
+        table.setSortingEnabled(False)
+        table.setRowCount(len(self._snapshot['timers']))
+        for r, (name, hist) in enumerate(self._snapshot['timers'].items()):
+            table.setItem(r, 0, QtWidgets.QTableWidgetItem(name))
+            for c, field in enumerate(self.TIMER_FIELDS, start=1):
+                table.setItem(r, c, self._item(hist[field]))
+        table.setSortingEnabled(True)
+        for r in range(table.rowCount()):
+            if table.item(r, 0).text() == selected:
+                table.selectRow(r)
+                break
+
+        self.counter_table.setRowCount(len(self._snapshot['counters']))
+        for r, (name, value) in enumerate(self._snapshot['counters'].items()):
+            self.counter_table.setItem(r, 0, QtWidgets.QTableWidgetItem(name))
+            self.counter_table.setItem(r, 1, self._item(value))
+        self._show_histogram()
+
+    def _selected_timer(self):
+        rows = self.timer_table.selectionModel().selectedRows()
+        return self.timer_table.item(rows[0].row(), 0).text() if rows else None
+
+    def _show_histogram(self):
+        hist = self._snapshot['timers'].get(self._selected_timer())
+        if hist is None:
+            self.histogram.setPlainText('')
+            return
+        peak = max(hist['buckets'].values()) or 1
+        lines = [f"{label:>7} ms {n:>8}  {'█' * round(40 * n / peak)}" for label, n in hist['buckets'].items()]
+        self.histogram.setPlainText('\n'.join(lines))
+
+    def reset(self):
+        perf.reset()
+        self.refresh()
+
+    def toggle_log(self, enabled):
+        if enabled:
+            perf.enable_log(PERF_LOG_FILENAME, self.slow_spin.value())
+        else:
+            perf.disable_log()
+        self.log_label.setText(perf.log_path or '')
+
+    def save_json(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Salva statistiche', 'perf_stats.json',
+                                                        'JSON (*.json)')
+        if not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(perf.snapshot(), f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, 'Errore', f'Impossibile salvare: {e}')
+
+
 # --------------------------- Finestra principale ---------------------------
 class VideoBrowser(QtWidgets.QWidget):
     def __init__(self):
         super().__init__()
         self.db = DBManager()
         self.parser = NFOParser()
-        self.stop_scan = False
-        self.temp_images = []   # temp files da pulire
-        self.last_playlist_paths = []  # ultima playlist
+        self.scan_thread = None
+        self.scan_worker = None
+        self.scan_progress = None
+        self.watcher = LibraryWatcher(self)
+        self.watcher.changes_ready.connect(self._on_watch_changes)
+        self._watch_pending = []
+        self._stats_dialog = None
+        self.poster_cache = PosterCache()
+        QtGui.QPixmapCache.setCacheLimit(PIXMAP_CACHE_KB)
+        self.poster_loader = PosterLoader(self.poster_cache, self)
+        self.poster_loader.ready.connect(self._on_poster_ready)
+        self._poster_request = None
+        self.query_runner = QueryRunner(self.db.db_path, self)
+        self.query_runner.ready.connect(self._on_query_ready)
+        self.query_runner.failed.connect(self._on_query_failed)
+        self._query_request = None
+        self._query_started = 0.0
+        # conteggi delle faccette: stesso meccanismo, thread e connessione separati
+        self.facet_runner = QueryRunner(self.db.db_path, self, work=all_facet_counts, name='facet-counts')
+        self.facet_runner.ready.connect(self._on_facet_counts_ready)
+        self.facet_runner.failed.connect(self._on_facet_counts_failed)
+        self._facet_request = None
+        self.last_playlist_id = None  # ultima playlist creata (salvata nel DB)
         self.init_ui()
         self.load_filters()
         self.load_data()
@@ -514,16 +1348,36 @@ class VideoBrowser(QtWidgets.QWidget):
         self.folder_edit.setPlaceholderText('Seleziona cartella da scansionare…')
         browse_btn = QtWidgets.QPushButton('Sfoglia')
         browse_btn.clicked.connect(self.browse_folder)
-        scan_btn = QtWidgets.QPushButton('Scansione (ricorsiva)')
-        scan_btn.clicked.connect(self.scan_videos)
-        manage_btn = QtWidgets.QPushButton('Gestione DB…')
-        manage_btn.clicked.connect(self.open_db_management)
+        self.scan_btn = QtWidgets.QPushButton('Scansione (ricorsiva)')
+        self.scan_btn.clicked.connect(self.scan_videos)
+        self.incremental_check = QtWidgets.QCheckBox('Incrementale')
+        self.incremental_check.setToolTip('Rielabora solo i video e i .nfo nuovi o modificati')
+        self.incremental_check.setChecked(True)
+        self.manage_btn = QtWidgets.QPushButton('Gestione DB…')
+        self.manage_btn.clicked.connect(self.open_db_management)
         top_scan_layout.addWidget(self.folder_edit)
         top_scan_layout.addWidget(browse_btn)
-        top_scan_layout.addWidget(scan_btn)
-        top_scan_layout.addWidget(manage_btn)
+        top_scan_layout.addWidget(self.incremental_check)
+        top_scan_layout.addWidget(QtWidgets.QLabel('Thread:'))
+        self.workers_spin = QtWidgets.QSpinBox()
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setValue(SCAN_WORKERS)
+        self.workers_spin.setToolTip('Thread paralleli per la lettura dei .nfo')
+        top_scan_layout.addWidget(self.workers_spin)
+        top_scan_layout.addWidget(self.scan_btn)
+        top_scan_layout.addWidget(self.manage_btn)
         left_vlayout.addLayout(top_scan_layout)
 
+        # Ricerca libera (titolo/percorso, trama, attori, registi, generi)
+        search_layout = QtWidgets.QHBoxLayout()
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText('Cerca in titolo, trama, attori, registi, generi… (Invio)')
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.returnPressed.connect(self.load_data)
+        search_layout.addWidget(QtWidgets.QLabel('Cerca:'))
+        search_layout.addWidget(self.search_edit)
+        left_vlayout.addLayout(search_layout)
+
         # Filtri
         filter_layout = QtWidgets.QHBoxLayout()
 
@@ -548,6 +1402,13 @@ class VideoBrowser(QtWidgets.QWidget):
         dir_layout.addWidget(self.director_list)
         filter_layout.addLayout(dir_layout)
 
+        actor_layout = QtWidgets.QVBoxLayout()
+        actor_layout.addWidget(QtWidgets.QLabel('Attori'))
+        self.actor_list = QtWidgets.QListWidget()
+        self.actor_list.setSelectionMode(QtWidgets.QAbstractItemView.MultiSelection)
+        actor_layout.addWidget(self.actor_list)
+        filter_layout.addLayout(actor_layout)
+
         ctrl_layout = QtWidgets.QVBoxLayout()
         self.apply_btn = QtWidgets.QPushButton('Applica filtri')
         self.apply_btn.clicked.connect(self.load_data)
@@ -559,24 +1420,86 @@ class VideoBrowser(QtWidgets.QWidget):
 
         left_vlayout.addLayout(filter_layout)
 
-        # Tabella risultati
-        self.table = QtWidgets.QTableWidget()
+        # Intervalli (colonne numeriche indicizzate); il valore minimo, mostrato come «—», è l'estremo aperto
+        range_layout = QtWidgets.QHBoxLayout()
+        self.year_from_spin = self._range_spin(1900, 2100)
+        self.year_to_spin = self._range_spin(1900, 2100)
+        self.rating_from_spin = self._range_spin(0, 10, step=0.5)
+        self.rating_to_spin = self._range_spin(0, 10, step=0.5)
+        self.duration_from_spin = self._range_spin(10, 600, step=10, suffix=' min')
+        self.duration_to_spin = self._range_spin(10, 600, step=10, suffix=' min')
+        for label, low, high in (('Anni da', self.year_from_spin, self.year_to_spin),
+                                 ('Rating da', self.rating_from_spin, self.rating_to_spin),
+                                 ('Durata da', self.duration_from_spin, self.duration_to_spin)):
+            range_layout.addWidget(QtWidgets.QLabel(label))
+            range_layout.addWidget(low)
+            range_layout.addWidget(QtWidgets.QLabel('a'))
+            range_layout.addWidget(high)
+            range_layout.addSpacing(12)
+        range_layout.addStretch(1)
+        left_vlayout.addLayout(range_layout)
+        self._range_spins = (self.year_from_spin, self.year_to_spin, self.rating_from_spin, self.rating_to_spin,
+                             self.duration_from_spin, self.duration_to_spin)
+
+        # conteggi delle faccette ristretti alla selezione corrente (ricalcolati a raffica finita)
+        self._facet_lists = {FACET_GENRE: self.genre_list, FACET_YEAR: self.year_list,
+                             ROLE_DIRECTOR: self.director_list, ROLE_ACTOR: self.actor_list}
+        self._facet_items = {}
+        self.facet_timer = QtCore.QTimer(self)
+        self.facet_timer.setSingleShot(True)
+        self.facet_timer.setInterval(150)
+        self.facet_timer.timeout.connect(self.update_facet_counts)
+        # filtri applicati dal vivo: la query parte quando i clic si fermano per FILTER_DEBOUNCE_MS
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.load_data)
+        for widget in self._facet_lists.values():
+            widget.itemSelectionChanged.connect(self.facet_timer.start)
+            widget.itemSelectionChanged.connect(self.filter_timer.start)
+        for spin in self._range_spins:
+            # valueChanged porta il valore: start(valore) cambierebbe l'intervallo del timer
+            spin.valueChanged.connect(lambda *_: self.facet_timer.start())
+            spin.valueChanged.connect(lambda *_: self.filter_timer.start())
+        self.search_edit.returnPressed.connect(self.facet_timer.start)
+
+        # Tabella risultati (modello a caricamento progressivo)
+        self.model = VideoTableModel(self)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
         self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
-        self.table.itemSelectionChanged.connect(self.on_selection_changed)
+        self.table.setWordWrap(False)
+        self.table.verticalHeader().setDefaultSectionSize(self.table.fontMetrics().height() + 8)
+        # larghezza colonne calcolata solo sulle prime righe caricate
+        self.table.horizontalHeader().setResizeContentsPrecision(VideoTableModel.PAGE_SIZE)
+        self.table.selectionModel().selectionChanged.connect(self.on_selection_changed)
         left_vlayout.addWidget(self.table)
 
         # Controlli inferiori
         bottom_layout = QtWidgets.QHBoxLayout()
-        self.export_btn = QtWidgets.QPushButton('Esporta CSV (DB video)')
+        self.export_btn = QtWidgets.QPushButton('Esporta CSV/JSONL (DB video)')
         self.export_btn.clicked.connect(self.export_csv)
         self.playlist_btn = QtWidgets.QPushButton('Crea Playlist M3U casuale')
         self.playlist_btn.clicked.connect(self.create_random_playlist)
         self.posterlist_btn = QtWidgets.QPushButton('Mostra locandina playlist')
         self.posterlist_btn.clicked.connect(self.show_last_playlist)
+        self.saved_playlists_btn = QtWidgets.QPushButton('Playlist salvate…')
+        self.saved_playlists_btn.clicked.connect(self.open_saved_playlists)
         bottom_layout.addWidget(self.export_btn)
         bottom_layout.addWidget(self.playlist_btn)
         bottom_layout.addWidget(self.posterlist_btn)
+        bottom_layout.addWidget(self.saved_playlists_btn)
+        self.stats_btn = QtWidgets.QPushButton('Statistiche…')
+        self.stats_btn.clicked.connect(self.open_stats)
+        bottom_layout.addWidget(self.stats_btn)
+        bottom_layout.addStretch(1)
+        self.watch_check = QtWidgets.QCheckBox('Monitora cartelle')
+        self.watch_check.setToolTip('Aggiorna il DB quando nelle cartelle scansionate cambiano video o .nfo')
+        self.watch_check.toggled.connect(self.toggle_watch)
+        self.watch_label = QtWidgets.QLabel()
+        bottom_layout.addWidget(self.watch_check)
+        bottom_layout.addWidget(self.watch_label)
         left_vlayout.addLayout(bottom_layout)
 
         main_layout.addLayout(left_vlayout, 3)
@@ -605,12 +1528,21 @@ class VideoBrowser(QtWidgets.QWidget):
         self.load_filters()
         self.load_data()
 
+    def open_stats(self):
+        # non modale: resta aperto e si aggiorna durante scansioni e ricerche
+        if self._stats_dialog is None:
+            self._stats_dialog = StatsDialog(self)
+        self._stats_dialog.show()
+        self._stats_dialog.raise_()
+
     def browse_folder(self):
         folder = QtWidgets.QFileDialog.getExistingDirectory(self, 'Select Folder')
         if folder:
             self.folder_edit.setText(folder)
 
     def scan_videos(self):
+        if self.scan_thread is not None:
+            return
         folder = self.folder_edit.text().strip()
         if not folder:
             QtWidgets.QMessageBox.warning(self, 'Info', 'Seleziona una cartella da scansionare.')
@@ -619,179 +1551,286 @@ class VideoBrowser(QtWidgets.QWidget):
             QtWidgets.QMessageBox.warning(self, 'Info', 'Cartella non valida.')
             return
 
-        video_files = []
-        for root, _, files in os.walk(folder):
-            for f in files:
-                ext = os.path.splitext(f)[1].lower()
-                if ext in VIDEO_EXTENSIONS:
-                    vpath = os.path.join(root, f)
-                    try:
-                        vmtime = os.path.getmtime(vpath)
-                    except Exception:
-                        vmtime = None
-                    nfo_path = os.path.splitext(vpath)[0] + '.nfo'
-                    genres_s = ''
-                    year = ''
-                    directors_s = ''
-                    plot = ''
-                    actors_s = ''
-                    duration = ''
-                    rating = ''
-                    poster = ''
-                    if os.path.exists(nfo_path):
-                        genres_s, year, directors_s, plot, actors_s, duration, rating, poster = self.parser.parse_video_info(nfo_path)
-                    video_files.append((vpath, vmtime, genres_s, year, directors_s, plot, actors_s, duration, rating, poster))
-
-        if not video_files:
-            QtWidgets.QMessageBox.information(self, 'Info', 'Nessun file video trovato nella cartella.')
+        self._start_scan(ScanWorker(self.db.db_path, folder,
+                                    incremental=self.incremental_check.isChecked(),
+                                    workers=self.workers_spin.value()))
+        self.scan_progress = ProgressDialog(self, maximum=0, modal=False)
+        self.scan_progress.setWindowTitle('Scansione')
+        self.scan_progress.cancel_requested.connect(self.scan_worker.cancel, QtCore.Qt.DirectConnection)
+        self.scan_progress.show()
+
+    def _start_scan(self, worker):
+        self.scan_worker = worker
+        self.scan_thread = QtCore.QThread(self)
+        self.scan_worker.moveToThread(self.scan_thread)
+        self.scan_thread.started.connect(self.scan_worker.run)
+        self.scan_worker.progress.connect(self._on_scan_progress)
+        self.scan_worker.finished.connect(self._on_scan_finished)
+        self.scan_worker.failed.connect(self._on_scan_failed)
+        # durante la scansione la tabella resta consultabile, ma niente operazioni che scrivono sul DB
+        self._set_scan_running(True)
+        self.scan_thread.start()
+
+    def _set_scan_running(self, running):
+        self.scan_btn.setEnabled(not running)
+        self.manage_btn.setEnabled(not running)
+
+    def _on_scan_progress(self, stats):
+        if self.scan_progress is None or self.scan_progress.canceled:
             return
-
-        progress = ProgressDialog(self, maximum=len(video_files))
-        progress.cancel_requested.connect(self.request_stop)
-        progress.show()
-
-        for i, (vpath, vmtime, genres_s, year, directors_s, plot, actors_s, duration, rating, poster) in enumerate(video_files, 1):
-            if self.stop_scan or progress.canceled:
-                break
-            try:
-                self.db.add_or_update_video(vpath, vmtime, genres_s, year, directors_s, plot, actors_s, duration, rating, poster)
-            except Exception as e:
-                print(f"DB error adding {vpath}: {e}")
-            progress.update_progress(i)
-
-        progress.close()
-        self.stop_scan = False
+        text = f"Trovati: {stats['discovered']}  Letti: {stats['parsed']}  Scritti: {stats['written']}"
+        maximum = max(stats['queued'], 1) if stats['walk_done'] else 0
+        self.scan_progress.update_progress(stats['written'], maximum=maximum, text=text)
+
+    def _finish_scan(self):
+        self.scan_thread.quit()
+        self.scan_thread.wait()
+        self.scan_thread.deleteLater()
+        self.scan_worker.deleteLater()
+        watch_update = self.scan_worker.targets is not None
+        self.scan_thread = None
+        self.scan_worker = None
+        if self.scan_progress is not None:
+            self.scan_progress.close()
+            self.scan_progress = None
+        self._set_scan_running(False)
         self.load_filters()
         self.load_data()
-        QtWidgets.QMessageBox.information(self, 'Done', 'Scansione completata (o interrotta).')
+        if self.watch_check.isChecked() and not watch_update:
+            # una nuova radice scansionata entra subito nel monitoraggio
+            self.watcher.start(self.db.get_scan_roots())
+            self._update_watch_label()
+        # modifiche arrivate mentre il DB era occupato
+        self._apply_watch_changes()
+        return watch_update
+
+    def _on_scan_finished(self, stats):
+        if self._finish_scan():
+            self._update_watch_label(stats)
+            return
+        if not stats['discovered'] and not stats['removed']:
+            QtWidgets.QMessageBox.information(self, 'Info', 'Nessun file video trovato nella cartella.')
+            return
+        title = 'Interrotta' if stats['canceled'] else 'Done'
+        QtWidgets.QMessageBox.information(self, title, self._scan_summary(stats, stats['canceled']))
 
-    def request_stop(self):
-        self.stop_scan = True
+    def _on_scan_failed(self, message):
+        if self._finish_scan():
+            self.watch_label.setText(f'Aggiornamento fallito: {message}')
+            return
+        QtWidgets.QMessageBox.warning(self, 'Errore', f'Scansione fallita: {message}')
+
+    @staticmethod
+    def _scan_summary(stats, canceled=False):
+        head = 'Scansione interrotta.' if canceled else 'Scansione completata.'
+        return (f"{head}\n\n"
+                f"Nuovi: {stats['added']}\n"
+                f"Modificati: {stats['changed']}\n"
+                f"Invariati: {stats['unchanged']}\n"
+                f"Rimossi: {stats['removed']}")
+
+    # --- Monitoraggio cartelle ---
+    def toggle_watch(self, enabled):
+        if not enabled:
+            self.watcher.stop()
+            self._watch_pending = []
+            self.watch_label.clear()
+            return
+        roots = self.db.get_scan_roots()
+        if not roots:
+            QtWidgets.QMessageBox.information(self, 'Info', 'Nessuna cartella scansionata da monitorare.')
+            self.watch_check.setChecked(False)
+            return
+        self.watcher.start(roots)
+        self._update_watch_label()
 
-    def load_filters(self):
-        self.genre_list.clear()
-        self.year_list.clear()
-        self.director_list.clear()
+    def _update_watch_label(self, stats=None):
+        if not self.watcher.active:
+            self.watch_label.setText('Nessuna cartella raggiungibile')
+            return
+        parts = []
+        if self.watcher.local_roots:
+            parts.append(f'{len(self.watcher.local_roots)} locali')
+        if self.watcher.polled_roots:
+            parts.append(f'{len(self.watcher.polled_roots)} in polling')
+        text = 'Monitorate: ' + ', '.join(parts)
+        if stats is not None:
+            text += (f" — ultimo aggiornamento {QtCore.QTime.currentTime().toString('HH:mm:ss')}: "
+                     f"+{stats['added']} ~{stats['changed']} -{stats['removed']}")
+            if stats.get('unreachable'):
+                text += f" ({len(stats['unreachable'])} non raggiungibili)"
+        self.watch_label.setText(text)
+
+    def _on_watch_changes(self, targets):
+        self._watch_pending.extend(targets)
+        self._apply_watch_changes()
+
+    def _apply_watch_changes(self):
+        # una sola scrittura alla volta: se è in corso una scansione si riprova al suo termine
+        if self.scan_thread is not None or not self._watch_pending or not self.watch_check.isChecked():
+            return
+        targets, self._watch_pending = self._watch_pending, []
+        self._start_scan(ScanWorker(self.db.db_path, targets=targets, workers=self.workers_spin.value()))
 
+    @timed('ui.load_filters')
+    def load_filters(self):
+        # valori selezionati da ripristinare dopo il ricaricamento (es. dopo una scansione)
+        selected = {kind: set(self._selected_values(widget)) for kind, widget in self._facet_lists.items()}
+        self._facet_items = {}
         try:
-            genres = self.db.get_all_genres()
-            for g in genres:
-                self.genre_list.addItem(g)
-
-            years = self.db.get_all_years()
-            for y in years:
-                self.year_list.addItem(str(y))
-
-            directors = self.db.get_all_directors()
-            for d in directors:
-                self.director_list.addItem(d)
+            for kind, widget in self._facet_lists.items():
+                widget.blockSignals(True)
+                widget.clear()
+                items = {}
+                for value, count in self.db.get_facets(kind):
+                    item = QtWidgets.QListWidgetItem(f'{value} ({count})')
+                    item.setData(QtCore.Qt.UserRole, value)
+                    item.setData(QtCore.Qt.UserRole + 1, count)
+                    widget.addItem(item)
+                    item.setSelected(value in selected[kind])
+                    items[value] = item
+                widget.blockSignals(False)
+                self._facet_items[kind] = items
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore caricamento filtri: {e}')
+        if any(selected.values()):
+            self.update_facet_counts()
 
-    def load_data(self):
-        selected_genres = [i.text() for i in self.genre_list.selectedItems()]
-        selected_years = [i.text() for i in self.year_list.selectedItems()]
-        selected_directors = [i.text() for i in self.director_list.selectedItems()]
+    def update_facet_counts(self):
+        """Chiede i conteggi di ogni lista, ristretti agli altri filtri, al thread delle faccette."""
+        self.facet_timer.stop()
+        self._facet_request = self.facet_runner.submit(self._current_filters())
 
-        try:
-            rows = self.db.query_videos(genres=selected_genres or None,
-                                        years=selected_years or None,
-                                        directors=selected_directors or None,
-                                        limit=10000)
-        except Exception as e:
-            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore query: {e}')
+    @timed('ui.facet_counts')
+    def _on_facet_counts_ready(self, request_id, all_counts):
+        if request_id != self._facet_request:
             return
+        for kind, items in self._facet_items.items():
+            counts = all_counts.get(kind, {})
+            for value, item in items.items():
+                n = counts.get(value, 0)
+                if item.data(QtCore.Qt.UserRole + 1) == n:
+                    continue
+                item.setData(QtCore.Qt.UserRole + 1, n)
+                item.setText(f'{value} ({n})')
+                item.setForeground(QtGui.QBrush(QtGui.QColor('#999')) if n == 0 else QtGui.QBrush())
+
+    def _on_facet_counts_failed(self, request_id, message):
+        if request_id in (0, self._facet_request):
+            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore conteggi filtri: {message}')
+
+    @staticmethod
+    def _selected_values(widget):
+        return [i.data(QtCore.Qt.UserRole) for i in widget.selectedItems()]
+
+    @staticmethod
+    def _range_spin(minimum, maximum, step=1, suffix=''):
+        spin = QtWidgets.QDoubleSpinBox() if isinstance(step, float) else QtWidgets.QSpinBox()
+        if isinstance(step, float):
+            spin.setDecimals(1)
+        spin.setRange(minimum - step, maximum)
+        spin.setSingleStep(step)
+        spin.setSpecialValueText('—')
+        spin.setSuffix(suffix)
+        spin.setValue(spin.minimum())
+        return spin
+
+    @staticmethod
+    def _spin_range(low, high, scale=1):
+        """(minimo, massimo) dalle due spin box, None se entrambe sono sull'estremo aperto."""
+        bounds = [None if spin.value() == spin.minimum() else spin.value() * scale for spin in (low, high)]
+        return None if bounds == [None, None] else tuple(bounds)
+
+    def _current_filters(self):
+        return {
+            'genres': self._selected_values(self.genre_list) or None,
+            'years': self._selected_values(self.year_list) or None,
+            'directors': self._selected_values(self.director_list) or None,
+            'actors': self._selected_values(self.actor_list) or None,
+            'search': self.search_edit.text().strip() or None,
+            'year_range': self._spin_range(self.year_from_spin, self.year_to_spin),
+            'rating_range': self._spin_range(self.rating_from_spin, self.rating_to_spin),
+            'duration_range': self._spin_range(self.duration_from_spin, self.duration_to_spin, scale=60),
+        }
 
-        headers = ['Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating', 'Poster', 'MTime']
-        self.table.setColumnCount(len(headers))
-        self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(len(rows))
-
-        for r, row in enumerate(rows):
-            self.table.setItem(r, 0, QtWidgets.QTableWidgetItem(row['path']))
-            self.table.setItem(r, 1, QtWidgets.QTableWidgetItem(row['genres'] or ''))
-            self.table.setItem(r, 2, QtWidgets.QTableWidgetItem(row['year'] or ''))
-            self.table.setItem(r, 3, QtWidgets.QTableWidgetItem(row['directors'] or ''))
-            self.table.setItem(r, 4, QtWidgets.QTableWidgetItem(row['plot'] or ''))
-            self.table.setItem(r, 5, QtWidgets.QTableWidgetItem(row['actors'] or ''))
-            self.table.setItem(r, 6, QtWidgets.QTableWidgetItem(row['duration'] or ''))
-            self.table.setItem(r, 7, QtWidgets.QTableWidgetItem(row['rating'] or ''))
-            self.table.setItem(r, 8, QtWidgets.QTableWidgetItem(row['poster'] or ''))
-            self.table.setItem(r, 9, QtWidgets.QTableWidgetItem(str(row['mtime']) if row['mtime'] is not None else ''))
-
+    def load_data(self):
+        """Chiede il risultato dei filtri correnti al thread delle query (interrompe la richiesta precedente)."""
+        self.filter_timer.stop()
+        self._query_started = time.perf_counter()
+        self._query_request = self.query_runner.submit(self._current_filters())
+
+    @timed('ui.load_data')
+    def _on_query_ready(self, request_id, ids):
+        if request_id != self._query_request:
+            return
+        perf.record('ui.filter_latency', time.perf_counter() - self._query_started)
+        self.model.set_ids(ids, self.db.get_videos_by_ids)
+        if self.model.canFetchMore():
+            self.model.fetchMore()
         self.table.resizeColumnsToContents()
 
+    def _on_query_failed(self, request_id, message):
+        if request_id in (0, self._query_request):
+            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore query: {message}')
+
     def export_csv(self):
-        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Salva CSV', '', 'CSV Files (*.csv)')
-        if not path:
+        if getattr(self, '_export_job', None):
             return
+        path = ask_export_path(self)
+        if path:
+            start_export(self, self.db.db_path, path,
+                         header=['ID', 'Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating',
+                                 'Poster', 'MTime'])
+
+    def show_playlist(self, playlist_id):
+        # titoli e metadati con una query; i file non (più) nel DB restano, con il solo percorso
         try:
-            rows = self.db.query_videos(limit=1000000)
-            with open(path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Path', 'Genres', 'Year', 'Directors', 'Plot', 'Actors', 'Duration', 'Rating', 'Poster', 'MTime'])
-                for r in rows:
-                    writer.writerow([r['path'], r['genres'], r['year'], r['directors'], r['plot'],
-                                     r['actors'], r['duration'], r['rating'], r['poster'], r['mtime']])
-            QtWidgets.QMessageBox.information(self, 'Esporta', f'Esportati {len(rows)} record in {path}')
+            items = self.db.get_playlist_items(playlist_id)
         except Exception as e:
-            QtWidgets.QMessageBox.warning(self, 'Errore', f'Impossibile esportare: {e}')
-
-    def _items_from_paths(self, paths):
-        items = []
-        cur = self.db.conn.cursor()
-        for p in paths:
-            try:
-                cur.execute("SELECT path, genres, year, directors, plot, actors, duration, rating, poster FROM videos WHERE path = ?", (p,))
-                row = cur.fetchone()
-                if row:
-                    items.append({k: row[k] for k in row.keys()})
-                else:
-                    items.append({'path': p, 'genres': '', 'year': '', 'directors': '', 'plot': '', 'actors': '', 'duration': '', 'rating': '', 'poster': ''})
-            except Exception:
-                items.append({'path': p, 'genres': '', 'year': '', 'directors': '', 'plot': '', 'actors': '', 'duration': '', 'rating': '', 'poster': ''})
-        return items
+            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore query: {e}')
+            return
+        dlg = PlaylistPosterDialog(self, items, self.poster_loader)
+        dlg.exec_()
 
     def show_last_playlist(self):
-        if not self.last_playlist_paths:
+        if self.last_playlist_id is None:
             QtWidgets.QMessageBox.information(self, 'Playlist', 'Nessuna playlist recente da mostrare.')
             return
-        items = self._items_from_paths(self.last_playlist_paths)
-        dlg = PlaylistPosterDialog(self, items)
-        dlg.exec_()
+        self.show_playlist(self.last_playlist_id)
 
-    def create_random_playlist(self):
-        visible_rows = []
-        for row in range(self.table.rowCount()):
-            item = self.table.item(row, 0)
-            if item:
-                visible_rows.append(item.text())
+    def open_saved_playlists(self):
+        SavedPlaylistsDialog(self).exec_()
 
-        if not visible_rows:
-            QtWidgets.QMessageBox.warning(self, 'Warning', 'Nessun video visibile da aggiungere alla playlist.')
+    def create_random_playlist(self):
+        options = PlaylistOptionsDialog(self)
+        if options.exec_() != QtWidgets.QDialog.Accepted:
             return
-
-        num, ok = QtWidgets.QInputDialog.getInt(self, 'Dimensione playlist', 'Numero di file:', 5, 1, len(visible_rows))
-        if not ok:
+        # estrazione nel DB sui filtri attivi; la playlist viene salvata con i parametri per rigenerarla
+        params = dict(options.options(), **self._current_filters())
+        try:
+            chosen = generate_playlist(self.db, **params)
+        except Exception as e:
+            QtWidgets.QMessageBox.warning(self, 'DB Error', f'Errore query: {e}')
             return
 
-        selection = random.sample(visible_rows, min(num, len(visible_rows)))
-        self.last_playlist_paths = selection[:]  # remember
-
-        items = self._items_from_paths(selection)
-        dlg = PlaylistPosterDialog(self, items)
-        dlg.exec_()
+        if not chosen:
+            QtWidgets.QMessageBox.warning(self, 'Warning', 'Nessun video adatto: controlla filtri, durata e limiti.')
+            return
 
-        playlist_path = os.path.join(str(Path.home()), f'random_playlist_{int(time.time())}.m3u')
+        playlist_path = default_playlist_path()
         try:
-            with open(playlist_path, 'w', encoding='utf-8', newline='\n') as f:
-                f.write('#EXTM3U\n')
-                for path in selection:
-                    f.write(path + '\n')
+            self.last_playlist_id = save_playlist(self.db, chosen, params)
+            export_playlist(self.db, self.last_playlist_id, playlist_path)
+            self.db.record_plays([row['id'] for row in chosen])
         except Exception as e:
             QtWidgets.QMessageBox.warning(self, 'Errore', f'Non posso creare la playlist: {e}')
             return
 
+        self.show_playlist(self.last_playlist_id)
+        self.play_m3u(playlist_path)
+
+    def play_m3u(self, playlist_path):
+        """Chiude l'eventuale VLC aperto e avvia la playlist."""
         try:
             if os.name == 'nt':
                 subprocess.call(['taskkill', '/IM', 'vlc.exe', '/F'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
@@ -818,42 +1857,45 @@ class VideoBrowser(QtWidgets.QWidget):
             QtWidgets.QMessageBox.warning(self, 'Errore', f'Errore avviando VLC: {e}')
 
     def _load_image(self, poster):
+        # la richiesta della riga selezionata prima non serve più
+        if self._poster_request is not None:
+            self.poster_loader.cancel([self._poster_request])
+            self._poster_request = None
         if not poster:
             self.poster_label.clear()
             return
-        if os.path.exists(poster):
-            pix = QtGui.QPixmap(poster)
-        else:
-            try:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(poster)[1] if '.' in poster else '.img')
-                tmp.close()
-                urllib.request.urlretrieve(poster, tmp.name)
-                self.temp_images.append(tmp.name)
-                pix = QtGui.QPixmap(tmp.name)
-            except Exception:
-                pix = None
-        if pix and not pix.isNull():
-            scaled = pix.scaled(self.poster_label.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
-            self.poster_label.setPixmap(scaled)
+        pix = self.poster_loader.cached(poster, self.poster_label.size())
+        if pix is not None:
+            self.poster_label.setPixmap(pix)
+            return
+        self.poster_label.setText('<span style="color:#888">Caricamento…</span>')
+        self._poster_request = self.poster_loader.request(poster, self.poster_label.size())
+
+    def _on_poster_ready(self, request_id, pix):
+        if request_id != self._poster_request:
+            return
+        self._poster_request = None
+        if pix is not None:
+            self.poster_label.setPixmap(pix)
         else:
             self.poster_label.clear()
 
     def on_selection_changed(self):
-        sel = self.table.selectedItems()
+        sel = self.table.selectionModel().selectedRows()
         if not sel:
-            self.poster_label.clear()
+            self._load_image('')
             self.details.clear()
             return
-        row = sel[0].row()
-        path = self.table.item(row, 0).text()
-        genres = self.table.item(row, 1).text()
-        year = self.table.item(row, 2).text()
-        directors = self.table.item(row, 3).text()
-        plot = self.table.item(row, 4).text()
-        actors = self.table.item(row, 5).text()
-        duration = self.table.item(row, 6).text()
-        rating = self.table.item(row, 7).text()
-        poster = self.table.item(row, 8).text()
+        item = self.model.row_dict(sel[0].row())
+        path = item['path'] or ''
+        genres = item['genres'] or ''
+        year = item['year'] or ''
+        directors = item['directors'] or ''
+        plot = item['plot'] or ''
+        actors = item['actors'] or ''
+        duration = item['duration'] or ''
+        rating = item['rating'] or ''
+        poster = item['poster'] or ''
 
         self._load_image(poster)
 
@@ -878,20 +1920,27 @@ class VideoBrowser(QtWidgets.QWidget):
 
     def closeEvent(self, event):
         try:
-            for t in getattr(self, 'temp_images', []):
-                try:
-                    os.unlink(t)
-                except Exception:
-                    pass
+            self.watcher.stop()
+            if self.scan_thread is not None:
+                self.scan_worker.cancel()
+                self.scan_thread.quit()
+                self.scan_thread.wait()
+            stop_export(self)
+            self.poster_loader.shutdown()
+            self.query_runner.shutdown()
+            self.facet_runner.shutdown()
             self.db.close()
         finally:
             event.accept()
 
 
 # --------------------------- Avvio app ---------------------------
-if __name__ == "__main__":
-    import sys
-    app = QtWidgets.QApplication(sys.argv)
+def main(argv=None):
+    app = QtWidgets.QApplication(sys.argv if argv is None else argv)
     w = VideoBrowser()
     w.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# nfo_parser.py
+# -*- coding: utf-8 -*-
+"""Lettura dei metadati dai file .nfo stile Kodi (nessuna dipendenza da Qt)."""
+import codecs
+import re
+import xml.etree.ElementTree as ET
+
+from perfstats import perf, timed
+
+# figli della radice che servono; gli altri (<set>, <uniqueid>, …) ElementTree li costruisce comunque,
+# il ciclo in parse_video_info li salta. Solo <fileinfo> (vedi _SKIPPED) è tolto prima del parse
+NFO_FIELDS = frozenset(('genre', 'year', 'director', 'plot', 'runtime', 'duration', 'rating',
+                        'thumb', 'poster', 'fanart', 'actor', 'actors'))
+
+_EMPTY = ('', '', '', '', '', '', '', '')
+_ROOT_TAG = re.compile(rb'<(?![?!])([^\s/>]+)')
+_XML_DECL = re.compile(rb'^\s*<\?xml[^>]*\?>')
+# '&' che non apre un'entità ("Tom & Jerry" scritto a mano)
+_BARE_AMP = re.compile(rb'&(?!(?:[A-Za-z][A-Za-z0-9]*|#[0-9]+|#x[0-9A-Fa-f]+);)')
+# sezioni mai lette e spesso la parte più grossa del file (flussi audio/sottotitoli): tolte prima del parse
+_SKIPPED = ((b'<fileinfo', b'</fileinfo>'),)
+
+
+def _clean(data):
+    """
+    Toglie ciò che fa fallire ElementTree su .nfo che Kodi accetta: BOM (anche UTF-16), spazi
+    prima della dichiarazione XML, testo dopo la chiusura della radice (l'URL dello scraper);
+    toglie anche <fileinfo>, che non serve e costerebbe più di tutto il resto.
+    """
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        data = _XML_DECL.sub(b'', data.decode('utf-16').encode('utf-8'))
+    elif data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    data = data.lstrip()
+    m = _ROOT_TAG.search(data)
+    if m:
+        end = data.rfind(b'</' + m.group(1))
+        close = data.find(b'>', end) if end != -1 else -1
+        if close != -1:
+            data = data[:close + 1]
+    for open_tag, close_tag in _SKIPPED:
+        start = data.find(open_tag)
+        while start != -1:
+            end = data.find(close_tag, start)
+            if end == -1:
+                break
+            data = data[:start] + data[end + len(close_tag):]
+            start = data.find(open_tag, start)
+    return data
+
+
+def _text(elem):
+    return (elem.text or '').strip() if elem is not None else ''
+
+
+# --------------------------- Parser NFO ---------------------------
+class NFOParser:
+    """Legge generi, anno, registi, trama, runtime, rating, poster/thumb, attori dai .nfo."""
+
+    def _parse_root(self, data):
+        try:
+            return ET.fromstring(data)
+        except ET.ParseError:
+            pass
+        perf.count('nfo.recovered')
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError:
+            # dichiarato (o presunto) UTF-8 ma scritto in Windows-1252
+            data = _XML_DECL.sub(b'', data.decode('cp1252', 'replace').encode('utf-8'))
+        data = _BARE_AMP.sub(b'&amp;', data)
+        try:
+            return ET.fromstring(data)
+        except ET.ParseError:
+            pass
+        # .nfo troncato o con errori a metà: lettura a flusso, si tiene quanto letto prima dell'errore
+        parser = ET.XMLPullParser(events=('start',))
+        root = None
+        try:
+            parser.feed(data)
+            for _, elem in parser.read_events():
+                if root is None:
+                    root = elem
+        except ET.ParseError:
+            pass
+        return root
+
+    @timed('nfo.parse')
+    def parse_video_info(self, nfo_path):
+        try:
+            with open(nfo_path, 'rb') as f:
+                root = self._parse_root(_clean(f.read()))
+            if root is None:
+                raise ValueError('nessun elemento XML')
+        except Exception as e:
+            perf.count('nfo.errors')
+            print(f"Error parsing {nfo_path}: {e}")
+            return _EMPTY
+
+        # un solo passaggio sui figli della radice; del primo elemento di ogni campo si usa il testo
+        genres, directors, actors, listed_actors = [], [], [], []
+        first = {}
+        for elem in root:
+            tag = elem.tag
+            if tag not in NFO_FIELDS:
+                continue
+            if tag == 'genre' or tag == 'director':
+                value = _text(elem)
+                if value:
+                    (genres if tag == 'genre' else directors).append(value)
+            elif tag == 'actor':
+                name = (elem.findtext('name') or elem.findtext('actor') or elem.text or '').strip()
+                if name:
+                    actors.append(name)
+            elif tag == 'actors':
+                listed_actors.extend(_text(child) for child in elem if _text(child))
+            elif tag not in first:
+                first[tag] = elem
+
+        duration = _text(first.get('runtime')) or _text(first.get('duration'))
+        poster = _text(first.get('thumb')) or _text(first.get('poster')) or _text(first.get('fanart'))
+        if not poster and 'fanart' in first:
+            fanart = first['fanart']
+            poster = (fanart.findtext('thumb') or fanart.findtext('poster') or '').strip()
+        return ('|'.join(genres), _text(first.get('year')), '|'.join(directors), _text(first.get('plot')),
+                '|'.join(actors + listed_actors), duration, _text(first.get('rating')), poster)
@@ -0,0 +1,182 @@
+# perfstats.py
+# -*- coding: utf-8 -*-
+"""
+Strumentazione leggera dei tempi (nessuna dipendenza da Qt): timer come context manager o
+decoratore, contatori e istogrammi di latenza in un'istanza globale del processo (`perf`),
+condivisa da GUI, thread di scansione e CLI. Il log JSON è facoltativo: con `enable_log`
+(o la variabile d'ambiente PLAYLIST_PERF_LOG) vengono scritte le operazioni più lente di
+`slow_ms` e, alla chiusura, un riepilogo completo.
+"""
+import atexit
+import functools
+import json
+import os
+import reprlib
+import threading
+import time
+from contextlib import contextmanager
+
+# estremi superiori (ms) dei secchi degli istogrammi di latenza; l'ultimo secchio è "oltre"
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+# operazioni più lente di così finiscono nel log (ms)
+SLOW_QUERY_MS = 200
+# log predefinito (stessa cartella del codice, come il DB)
+PERF_LOG_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_log.jsonl')
+
+
+class Histogram:
+    """Conteggio, totale, minimo, massimo e distribuzione per secchi di una misura in ms."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = max(self.max, ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, p):
+        """Stima dal secchio (estremo superiore); il massimo reale per l'ultimo secchio."""
+        if not self.count:
+            return 0.0
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return float(min(LATENCY_BUCKETS_MS[i], self.max)) if i < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count, 'total_ms': round(self.total, 3),
+                'avg_ms': round(self.total / self.count, 3) if self.count else 0.0,
+                'min_ms': round(self.min or 0.0, 3), 'max_ms': round(self.max, 3),
+                'p50_ms': round(self.percentile(50), 3), 'p95_ms': round(self.percentile(95), 3),
+                'buckets': dict(zip([f'<={b}' for b in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}'],
+                                    self.buckets))}
+
+
+class PerfStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._counters = {}
+        self.started = time.time()
+        self.log_path = None
+        self.slow_ms = SLOW_QUERY_MS
+
+    # --- raccolta ---
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def record(self, name, seconds, detail=None):
+        """Registra una durata; `detail` (stringa o funzione che la produce) va nel log se lenta."""
+        ms = seconds * 1000.0
+        with self._lock:
+            hist = self._timers.get(name)
+            if hist is None:
+                hist = self._timers[name] = Histogram()
+            hist.add(ms)
+        if self.log_path and ms >= self.slow_ms:
+            self._log({'event': 'slow', 'name': name, 'ms': round(ms, 3),
+                       'detail': detail() if callable(detail) else detail})
+
+    @contextmanager
+    def timer(self, name, detail=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0, detail)
+
+    def timed(self, name):
+        """Decoratore per metodi: misura ogni chiamata; nel log delle lente finiscono gli argomenti."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                t0 = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - t0,
+                                lambda: _describe_call(args[1:], kwargs))
+            return wrapper
+        return decorator
+
+    # --- lettura ---
+    def snapshot(self):
+        with self._lock:
+            return {'since': self.started, 'elapsed_s': round(time.time() - self.started, 3),
+                    'timers': {k: v.to_dict() for k, v in sorted(self._timers.items())},
+                    'counters': dict(sorted(self._counters.items()))}
+
+    def reset(self):
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    # --- log JSON facoltativo ---
+    def enable_log(self, path=PERF_LOG_FILENAME, slow_ms=SLOW_QUERY_MS):
+        self.log_path = path
+        self.slow_ms = slow_ms
+
+    def disable_log(self):
+        self.log_path = None
+
+    def dump(self, path=None):
+        """Aggiunge al log (o a `path`) una riga con il riepilogo completo."""
+        self._log({'event': 'summary', **self.snapshot()}, path)
+
+    def _log(self, entry, path=None):
+        path = path or self.log_path
+        if not path:
+            return
+        entry = {'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), 'pid': os.getpid(), **entry}
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        try:
+            with self._lock, open(path, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Perf log write failed {path}: {e}")
+
+
+# repr degli argomenti nel log delle lente: troncato per argomento, senza stringhificare un
+# lotto intero (500 record di upsert_videos, migliaia di percorsi di delete_paths)
+_arg_repr = reprlib.Repr()
+_arg_repr.maxlist = _arg_repr.maxtuple = _arg_repr.maxset = _arg_repr.maxfrozenset = 5
+_arg_repr.maxdict = 5
+_arg_repr.maxstring = _arg_repr.maxother = 80
+_arg_repr.maxlevel = 2
+
+
+def _describe_call(args, kwargs, limit=300):
+    parts = [_arg_repr.repr(a) for a in args] + \
+        [f'{k}={_arg_repr.repr(v)}' for k, v in kwargs.items() if v is not None]
+    text = ', '.join(parts)
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+perf = PerfStats()
+timer = perf.timer
+timed = perf.timed
+
+if os.environ.get('PLAYLIST_PERF_LOG'):
+    perf.enable_log(os.environ['PLAYLIST_PERF_LOG'], float(os.environ.get('PLAYLIST_SLOW_MS', SLOW_QUERY_MS)))
+
+
+@atexit.register
+def _dump_at_exit():
+    if perf.log_path:
+        perf.dump()
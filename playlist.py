@@ -0,0 +1,152 @@
+# playlist.py
+# -*- coding: utf-8 -*-
+"""Selezione casuale, playlist salvate nel DB e scrittura delle M3U (nessuna dipendenza da Qt)."""
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+from db_manager import split_serialized
+
+# un titolo messo in playlist non viene riproposto per questi giorni (0 = nessun limite)
+RECENT_DAYS = 14
+# con un budget di durata ci si ferma quando mancano meno di così a riempirlo (secondi)
+BUDGET_SLACK_SECONDS = 5 * 60
+# candidati scartati di fila (non entrano nel budget o superano i limiti) prima di arrendersi
+MAX_MISSES = 200
+
+
+def default_playlist_path():
+    return os.path.join(str(Path.home()), f'random_playlist_{int(time.time())}.m3u')
+
+
+def generate_playlist(db, count=None, budget_seconds=None, weight_by_rating=False, recent_days=RECENT_DAYS,
+                      max_per_director=None, max_per_genre=None, **filters):
+    """
+    Estrae una playlist dai video filtrati (filtri come DBManager.iter_videos) leggendo il
+    cursore in ordine casuale solo finché serve:
+      - `count` titoli e/o titoli la cui durata totale sta in `budget_seconds`,
+      - con `weight_by_rating` i titoli con rating alto escono più spesso,
+      - niente titoli già messi in playlist negli ultimi `recent_days` giorni,
+      - al massimo `max_per_director` titoli per regista e `max_per_genre` per genere.
+    Con un budget, quando una passata si ferma (troppi scarti o candidati finiti) ne parte
+    un'altra sui soli titoli che stanno nel tempo rimasto, finché una passata non aggiunge nulla.
+    Ritorna le righe scelte (dict con id, path, genres, year, directors, duration, rating,
+    duration_sec, seconds).
+    """
+    if count is None and budget_seconds is None:
+        raise ValueError('Indicare il numero di titoli o la durata totale')
+    low, high = filters.get('duration_range') or (None, None)
+    recent_since = time.time() - recent_days * 86400 if recent_days else None
+    chosen = []
+    chosen_ids = set()
+    total = 0
+    per_director = Counter()
+    per_genre = Counter()
+    while True:
+        if budget_seconds is not None:
+            # titoli senza durata o più lunghi del tempo rimasto non entrerebbero: esclusi nella query
+            remaining = budget_seconds - total
+            filters['duration_range'] = (low, remaining if high is None else min(high, remaining))
+        cursor = db.iter_playlist_candidates(weight_by_rating=weight_by_rating, recent_since=recent_since, **filters)
+        added = 0
+        misses = 0
+        try:
+            while misses < MAX_MISSES:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    break
+                for row in rows:
+                    if row['id'] in chosen_ids:
+                        continue
+                    directors = split_serialized(row['directors'])
+                    genres = split_serialized(row['genres'])
+                    seconds = row['duration_sec']
+                    fits = not (max_per_director and any(per_director[d] >= max_per_director for d in directors)) \
+                        and not (max_per_genre and any(per_genre[g] >= max_per_genre for g in genres))
+                    if fits and budget_seconds is not None:
+                        fits = seconds is not None and total + seconds <= budget_seconds
+                    if not fits:
+                        misses += 1
+                        if misses >= MAX_MISSES:
+                            break
+                        continue
+                    misses = 0
+                    added += 1
+                    chosen.append(dict(row, seconds=seconds))
+                    chosen_ids.add(row['id'])
+                    total += seconds or 0
+                    per_director.update(directors)
+                    per_genre.update(genres)
+                    if count is not None and len(chosen) >= count:
+                        return chosen
+                    if budget_seconds is not None and budget_seconds - total < BUDGET_SLACK_SECONDS:
+                        return chosen
+        finally:
+            cursor.close()
+        if budget_seconds is None or not added:
+            return chosen
+
+
+def default_playlist_name():
+    return time.strftime('Playlist %Y-%m-%d %H:%M')
+
+
+def save_playlist(db, chosen, options=None, name=None):
+    """Salva nel DB i titoli scelti da generate_playlist con i parametri usati; ritorna l'id."""
+    return db.create_playlist(name or default_playlist_name(), [row['path'] for row in chosen], options)
+
+
+def regenerate_playlist(db, playlist_id):
+    """Nuova estrazione con i parametri salvati della playlist, che ne sostituisce i titoli."""
+    playlist = db.get_playlist(playlist_id)
+    if playlist is None:
+        raise ValueError(f'Playlist inesistente: {playlist_id}')
+    if not playlist['options']:
+        raise ValueError('La playlist non ha parametri di generazione salvati')
+    chosen = generate_playlist(db, **playlist['options'])
+    db.set_playlist_items(playlist_id, [row['path'] for row in chosen])
+    return chosen
+
+
+def export_playlist(db, playlist_id, path):
+    """Scrive la playlist salvata come M3U estesa leggendo i titoli dal cursore; ritorna le voci scritte."""
+    cursor = db.iter_playlist_items(playlist_id)
+    try:
+        written = write_m3u(path, cursor)
+    finally:
+        cursor.close()
+    db.set_playlist_m3u(playlist_id, os.path.abspath(path))
+    return written
+
+
+def _m3u_title(item):
+    title = os.path.splitext(os.path.basename(item['path']))[0]
+    year = item['year']
+    if year and year not in title:
+        title = f'{title} ({year})'
+    # una voce M3U sta su una riga
+    return ' '.join(title.split())
+
+
+def write_m3u(path, items):
+    """
+    Scrive una M3U estesa: per ogni voce una riga #EXTINF con durata in secondi (-1 se ignota) e
+    titolo (nome del file, con l'anno se manca), poi il percorso. `items` sono righe con path,
+    year e duration_sec, anche un cursore: vanno dritte nel file senza tenerle in memoria. Il
+    file compare solo completo. Ritorna il numero di voci.
+    """
+    tmp = path + '.part'
+    written = 0
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+            f.write('#EXTM3U\n')
+            for item in items:
+                f.write(f"#EXTINF:{item['duration_sec'] or -1},{_m3u_title(item)}\n{item['path']}\n")
+                written += 1
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    os.replace(tmp, path)
+    return written
@@ -0,0 +1,160 @@
+# poster_cache.py
+# -*- coding: utf-8 -*-
+"""Cache su disco delle locandine remote (nessuna dipendenza da Qt)."""
+import os
+import time
+import json
+import hashlib
+import threading
+import urllib.error
+import urllib.request
+
+from perfstats import perf, timed
+
+# cache su disco delle locandine remote (stessa cartella del codice, come il DB)
+POSTER_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'poster_cache')
+POSTER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# dopo quanto tempo una locandina in cache viene rivalidata (If-None-Match / If-Modified-Since)
+POSTER_REVALIDATE_SECONDS = 7 * 24 * 3600
+# timeout per richiesta (secondi)
+POSTER_TIMEOUT_SECONDS = 10
+
+
+# --------------------------- Cache locandine ---------------------------
+class PosterCache:
+    """
+    Cache su disco delle locandine remote, indirizzata per hash SHA-256 dell'URL.
+    Accanto ad ogni file un .json con ETag/Last-Modified per la rivalidazione; l'mtime del
+    file è l'ultimo accesso e guida l'eviction LRU oltre `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=POSTER_CACHE_DIR, max_bytes=POSTER_CACHE_MAX_BYTES,
+                 revalidate_after=POSTER_REVALIDATE_SECONDS, timeout=POSTER_TIMEOUT_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._total = None  # byte occupati, calcolati al primo bisogno
+
+    @staticmethod
+    def is_remote(poster):
+        return poster.lower().startswith(('http://', 'https://', 'ftp://'))
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        data = os.path.join(self.cache_dir, key[:2], key)
+        return data, data + '.json'
+
+    @timed('poster.get')
+    def get(self, url):
+        """Ritorna il file locale della locandina `url`, scaricandola o rivalidandola se serve; None se non disponibile."""
+        data, meta_path = self._paths(url)
+        meta = {}
+        if os.path.exists(data):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+            if time.time() - meta.get('checked', 0) < self.revalidate_after:
+                perf.count('poster.cache_hit')
+                self._touch(data)
+                return data
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=self.timeout) as resp:
+                content = resp.read()
+                meta = {'url': url, 'etag': resp.headers.get('ETag'),
+                        'last_modified': resp.headers.get('Last-Modified'), 'checked': time.time()}
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and os.path.exists(data):
+                perf.count('poster.not_modified')
+                meta['checked'] = time.time()
+                self._write_meta(meta_path, meta)
+                self._touch(data)
+                return data
+            perf.count('poster.errors')
+            print(f"Poster download failed {url}: {e}")
+            return data if os.path.exists(data) else None
+        except Exception as e:
+            perf.count('poster.errors')
+            print(f"Poster download failed {url}: {e}")
+            # meglio la copia non rivalidata che niente
+            return data if os.path.exists(data) else None
+        perf.count('poster.downloaded')
+        perf.count('poster.bytes', len(content))
+        self._store(data, meta_path, content, meta)
+        return data
+
+    def _touch(self, path):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _write_meta(self, meta_path, meta):
+        try:
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except OSError:
+            pass
+
+    def _store(self, data, meta_path, content, meta):
+        os.makedirs(os.path.dirname(data), exist_ok=True)
+        try:
+            old_size = os.path.getsize(data)
+        except OSError:
+            old_size = 0
+        # scrittura atomica: altri thread possono leggere lo stesso file nel frattempo
+        tmp = f'{data}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, data)
+        self._write_meta(meta_path, meta)
+        with self._lock:
+            if self._total is not None:
+                self._total += len(content) - old_size
+        self.evict()
+
+    def _entries(self):
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(('.json', '.tmp')):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+
+    def size(self):
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._entries()) if os.path.isdir(self.cache_dir) else 0
+            return self._total
+
+    def evict(self):
+        """Elimina i file usati meno di recente finché la cache scende al 90% di `max_bytes`."""
+        if self.size() <= self.max_bytes:
+            return
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(e[1] for e in entries)
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                for p in (path, path + '.json'):
+                    try:
+                        os.unlink(p)
+                    except OSError:
+                        pass
+                total -= size
+            self._total = total
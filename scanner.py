@@ -0,0 +1,347 @@
+# scanner.py
+# -*- coding: utf-8 -*-
+"""Scansione delle cartelle video verso il DB (nessuna dipendenza da Qt)."""
+import os
+import queue
+import threading
+import time
+
+from db_manager import SCAN_BATCH_SIZE
+from nfo_parser import NFOParser
+from perfstats import perf, timed
+
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.wmv', '.flv']
+# thread che leggono i .nfo in parallelo (librerie su NAS: il collo di bottiglia è la latenza di I/O)
+SCAN_WORKERS = 8
+# locandine accanto al video: "<nome video>-poster.jpg"
+POSTER_SUFFIXES = ('-poster.jpg', '-poster.png')
+# file validi per tutta la cartella (struttura Kodi "un film per cartella"):
+# usati solo se nella cartella c'è un solo video
+FOLDER_NFO_NAME = 'movie.nfo'
+FOLDER_POSTER_NAMES = ('poster.jpg', 'poster.png', 'folder.jpg', 'folder.png')
+
+
+def is_reachable(root):
+    """False per una radice assente o vuota, come un mount di rete non montato."""
+    try:
+        with os.scandir(root) as it:
+            return next(it, None) is not None
+    except OSError:
+        return False
+
+
+def drop_unreachable(targets, roots):
+    """
+    Toglie dai bersagli (cartella, ricorsivo) quelli sotto una radice non raggiungibile: con il mount
+    staccato ogni sottocartella sembra sparita, ma i suoi video non vanno eliminati.
+    Ritorna (bersagli rimasti, radici saltate).
+    """
+    roots = sorted({os.path.abspath(r) for r in roots}, key=len, reverse=True)
+    reachable = {}
+    kept = []
+    for folder, recursive in targets:
+        path = os.path.abspath(folder)
+        root = next((r for r in roots if path == r or path.startswith(os.path.join(r, ''))), None)
+        if root is not None:
+            if root not in reachable:
+                reachable[root] = is_reachable(root)
+            if not reachable[root]:
+                continue
+        kept.append((folder, recursive))
+    return kept, sorted(r for r, ok in reachable.items() if not ok)
+
+
+# --------------------------- Scansione libreria ---------------------------
+class LibraryScanner:
+    """
+    Pipeline di scansione a flusso:
+      - un thread percorre le cartelle e mette in coda i video nuovi o modificati,
+      - `workers` thread leggono i .nfo con NFOParser,
+      - il thread chiamante (l'unico che usa la connessione al DB) scrive i record a lotti.
+    Le tre fasi si sovrappongono: la scrittura inizia mentre la visita è ancora in corso.
+    """
+
+    def __init__(self, db, parser=None, workers=SCAN_WORKERS, batch_size=SCAN_BATCH_SIZE, cancel_event=None):
+        self.db = db
+        self.parser = parser or NFOParser()
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self._cancel = cancel_event or threading.Event()
+        self._lock = threading.Lock()
+        self.stats = {}
+        self._unreadable = []
+        self._walk_failed = False
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def canceled(self):
+        return self._cancel.is_set()
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _on_walk_error(self, err):
+        # una cartella sparita è una rimozione; una illeggibile (permessi, I/O su NAS) no
+        if not isinstance(err, (FileNotFoundError, NotADirectoryError)):
+            perf.count('scan.errors')
+            print(f"Error listing {err.filename}: {err}")
+            self._unreadable.append(err.filename)
+
+    def _missing(self, stored, present):
+        """Percorsi salvati ma non più su disco, esclusi quelli sotto cartelle illeggibili."""
+        blocked = tuple(os.path.join(d, '') for d in self._unreadable)
+        return [p for p in stored if p not in present and not (blocked and p.startswith(blocked))]
+
+    def _list_tree(self, folder, recursive=True):
+        """
+        Visita con os.scandir: per ogni cartella produce (cartella, [DirEntry dei suoi file]).
+        Come os.walk non entra nei link a cartelle; gli errori vanno a _on_walk_error.
+        """
+        pending = [folder]
+        while pending:
+            current = pending.pop()
+            files = []
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if not is_dir:
+                            files.append(entry)
+                        elif recursive and not entry.is_symlink():
+                            pending.append(entry.path)
+            except OSError as e:
+                self._on_walk_error(e)
+                continue
+            yield current, files
+
+    def _iter_videos(self, folder, recursive=True):
+        """
+        Video sotto `folder` con mtime/dimensione, .nfo e locandina locale. .nfo e locandine si
+        cercano nell'elenco della cartella già letto, senza interrogare il filesystem: l'unica
+        stat è quella del video (gratuita su Windows) e quella del .nfo trovato.
+        """
+        for current, files in self._list_tree(folder, recursive):
+            # i video per nome reale (su Linux "Film.mkv" e "film.mkv" sono due file); .nfo e
+            # locandine anche senza distinguere maiuscole, preferendo il nome esatto
+            videos = [e for e in files if os.path.splitext(e.name)[1].lower() in VIDEO_EXTENSIONS]
+            exact = {e.name: e for e in files}
+            folded = {}
+            for e in files:
+                folded.setdefault(e.name.lower(), e)
+
+            def find(name):
+                return exact.get(name) or folded.get(name.lower())
+
+            single = len(videos) == 1
+            for entry in videos:
+                stem = os.path.splitext(entry.name)[0]
+                try:
+                    st = entry.stat()
+                    vmtime, vsize = st.st_mtime, st.st_size
+                except OSError:
+                    vmtime, vsize = None, None
+                nfo = find(stem + '.nfo') or (find(FOLDER_NFO_NAME) if single else None)
+                nfo_mtime = None
+                if nfo is not None:
+                    try:
+                        nfo_mtime = nfo.stat().st_mtime
+                    except OSError:
+                        pass
+                names = [stem + suffix for suffix in POSTER_SUFFIXES]
+                if single:
+                    names += FOLDER_POSTER_NAMES
+                poster = next((e.path for e in map(find, names) if e is not None), '')
+                yield {'path': entry.path, 'mtime': vmtime, 'size': vsize,
+                       'nfo_path': nfo.path if nfo is not None else os.path.join(current, stem + '.nfo'),
+                       'nfo_mtime': nfo_mtime, 'poster': poster}
+
+    def _walk(self, targets, stored, incremental, seen, work_q):
+        t0 = time.perf_counter()
+        try:
+            for folder, recursive in targets:
+                for entry in self._iter_videos(folder, recursive):
+                    if self.canceled:
+                        return
+                    seen.add(entry['path'])
+                    self._bump('discovered')
+                    previous = stored.get(entry['path'])
+                    if previous is None:
+                        self._bump('added')
+                    elif previous == (entry['mtime'], entry['size'], entry['nfo_mtime']):
+                        self._bump('unchanged')
+                        if incremental:
+                            continue
+                    else:
+                        self._bump('changed')
+                    self._bump('queued')
+                    work_q.put(entry)
+        except Exception as e:
+            self._walk_failed = True
+            perf.count('scan.errors')
+            print(f"Error walking {targets}: {e}")
+        finally:
+            perf.record('scan.walk', time.perf_counter() - t0)
+            with self._lock:
+                self.stats['walk_done'] = True
+            for _ in range(self.workers):
+                work_q.put(None)
+
+    def _parse(self, work_q, result_q):
+        while True:
+            entry = work_q.get()
+            if entry is None:
+                result_q.put(None)
+                return
+            if self.canceled:
+                continue
+            fields = ('', '', '', '', '', '', '', '')
+            if entry['nfo_mtime'] is not None:
+                fields = self.parser.parse_video_info(entry['nfo_path'])
+            genres_s, year, directors_s, plot, actors_s, duration, rating, poster = fields
+            result_q.put({'path': entry['path'], 'mtime': entry['mtime'], 'genres': genres_s, 'year': year,
+                          'directors': directors_s, 'plot': plot, 'actors': actors_s, 'duration': duration,
+                          'rating': rating, 'poster': poster or entry['poster'], 'size': entry['size'],
+                          'nfo_mtime': entry['nfo_mtime']})
+            self._bump('parsed')
+
+    def scan(self, folder, incremental=True, progress=None):
+        """
+        Scansiona `folder` e ritorna le statistiche (discovered, queued, parsed, written,
+        added, changed, unchanged, removed, canceled). `progress(stats)` viene chiamata dal
+        thread chiamante dopo ogni lotto e durante le attese.
+        """
+        folder = os.path.abspath(folder)
+        self.db.add_scan_root(folder)
+        return self.update([(folder, True)], incremental=incremental, progress=progress)
+
+    @staticmethod
+    def _normalize_targets(targets):
+        """Toglie i doppioni e le cartelle già comprese in un bersaglio ricorsivo."""
+        merged = {}
+        for folder, recursive in targets:
+            folder = os.path.abspath(folder)
+            merged[folder] = merged.get(folder, False) or recursive
+        recursive_roots = [os.path.join(f, '') for f, rec in merged.items() if rec]
+        return sorted((f, rec) for f, rec in merged.items()
+                      if not any(f.startswith(r) for r in recursive_roots if r != os.path.join(f, '')))
+
+    @timed('scan.update')
+    def update(self, targets, incremental=True, progress=None):
+        """
+        Come scan() ma su un elenco di bersagli (cartella, ricorsivo) in un'unica passata e un'unica
+        serie di lotti: è il percorso usato dal monitoraggio delle cartelle. Una cartella sparita fa
+        rimuovere tutti i video salvati sotto di essa, tranne quando è sparita l'intera radice
+        (assente o vuota): quei bersagli vengono saltati e la radice finisce in 'unreachable'.
+        """
+        targets, unreachable = drop_unreachable(self._normalize_targets(targets), self.db.get_scan_roots())
+        self.stats = {'discovered': 0, 'queued': 0, 'parsed': 0, 'written': 0,
+                      'added': 0, 'changed': 0, 'unchanged': 0, 'removed': 0, 'walk_done': False,
+                      'unreachable': unreachable}
+        self._unreadable = []
+        self._walk_failed = False
+        stored = {}
+        for folder, recursive in targets:
+            stored.update(self.db.get_scan_state(folder, recursive=recursive))
+        seen = set()
+        # code limitate: il walker non corre troppo avanti rispetto a parser e scrittore
+        work_q = queue.Queue(maxsize=self.workers * 64)
+        result_q = queue.Queue(maxsize=self.batch_size * 2)
+
+        walker = threading.Thread(target=self._walk, args=(targets, stored, incremental, seen, work_q),
+                                  name='scan-walker', daemon=True)
+        parsers = [threading.Thread(target=self._parse, args=(work_q, result_q), name=f'scan-parser-{i}', daemon=True)
+                   for i in range(self.workers)]
+        walker.start()
+        for t in parsers:
+            t.start()
+
+        batch = []
+        running = self.workers
+        while running:
+            try:
+                rec = result_q.get(timeout=0.1)
+            except queue.Empty:
+                if progress:
+                    progress(self.snapshot())
+                continue
+            if rec is None:
+                running -= 1
+                continue
+            if self.canceled:
+                continue  # si continua a svuotare la coda finché i parser terminano
+            batch.append(rec)
+            if len(batch) >= self.batch_size:
+                self._flush(batch, progress)
+                batch = []
+        if batch and not self.canceled:
+            self._flush(batch, progress)
+
+        walker.join()
+        for t in parsers:
+            t.join()
+
+        # pulizia degli orfani a fine scansione: solo se la visita è stata completa
+        removed = self._missing(stored, seen)
+        if removed and not self.canceled and not self._walk_failed:
+            try:
+                self._bump('removed', self.db.delete_paths(removed))
+            except Exception as e:
+                perf.count('scan.errors')
+                print(f"DB error removing missing files: {e}")
+
+        stats = self.snapshot()
+        stats['canceled'] = self.canceled
+        if progress:
+            progress(stats)
+        return stats
+
+    def _flush(self, batch, progress):
+        try:
+            self._bump('written', self.db.upsert_videos(batch, batch_size=self.batch_size))
+        except Exception as e:
+            perf.count('scan.errors')
+            print(f"DB error writing batch at {batch[0]['path']}: {e}")
+        if progress:
+            progress(self.snapshot())
+
+    def prune(self, roots=None, dry_run=False, progress=None):
+        """
+        Per ogni radice (default: tutte quelle già scansionate) confronta i video salvati con
+        l'elenco attuale delle cartelle (differenza di insiemi, nessuna stat per file) ed elimina
+        a lotti quelli spariti. Le radici non raggiungibili (assenti o vuote, come un mount di rete
+        non montato) vengono saltate. Ritorna {'roots', 'skipped', 'orphans', 'removed'}.
+        """
+        if roots is None:
+            roots = self.db.get_scan_roots()
+        elif isinstance(roots, str):
+            roots = [roots]
+        result = {'roots': [], 'skipped': [], 'orphans': [], 'removed': 0}
+        orphans = set()
+        for root in roots:
+            root = os.path.abspath(root)
+            if self.canceled:
+                break
+            if not is_reachable(root):
+                result['skipped'].append(root)
+                continue
+            self._unreadable = []
+            stored = self.db.get_scan_state(root)
+            present = set()
+            for _, files in self._list_tree(root):
+                present.update(e.path for e in files if os.path.splitext(e.name)[1].lower() in VIDEO_EXTENSIONS)
+            orphans.update(self._missing(stored, present))
+            result['roots'].append(root)
+        result['orphans'] = sorted(orphans)
+        if orphans and not dry_run and not self.canceled:
+            result['removed'] = self.db.delete_paths(result['orphans'], progress=progress)
+        return result
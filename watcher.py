@@ -0,0 +1,112 @@
+# watcher.py
+# -*- coding: utf-8 -*-
+"""Rilevamento delle modifiche nelle cartelle della libreria (nessuna dipendenza da Qt)."""
+import os
+
+from scanner import VIDEO_EXTENSIONS
+
+# attesa senza nuovi eventi prima di applicare le modifiche raccolte (secondi)
+WATCH_DEBOUNCE_SECONDS = 2.0
+# intervallo tra due letture delle cartelle in modalità polling (secondi)
+POLL_INTERVAL_SECONDS = 30.0
+# i watch di inotify sulle cartelle vedono file creati, eliminati o rinominati ma non quelli
+# riscritti sul posto (.nfo modificato, video cresciuto o sostituito): sui dischi locali un
+# polling lento li recupera senza un watch per ogni file
+LOCAL_POLL_INTERVAL_SECONDS = 300.0
+# file system su cui inotify non vede le modifiche fatte da altre macchine
+NETWORK_FS_TYPES = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs', '9p', 'davfs', 'fuse.sshfs', 'fuse.rclone'}
+WATCHED_EXTENSIONS = set(VIDEO_EXTENSIONS) | {'.nfo'}
+
+
+def is_network_path(path):
+    """True se `path` sta su un mount di rete (Linux: /proc/mounts; Windows: percorso UNC)."""
+    path = os.path.abspath(path)
+    if path.startswith('\\\\'):
+        return True
+    try:
+        with open('/proc/mounts', 'r', encoding='utf-8') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return False
+    best, fstype = '', None
+    for parts in mounts:
+        if len(parts) < 3:
+            continue
+        mnt = parts[1].replace('\\040', ' ')
+        inside = path == mnt or path.startswith(os.path.join(mnt, ''))
+        if inside and len(mnt) > len(best):
+            best, fstype = mnt, parts[2]
+    return fstype in NETWORK_FS_TYPES
+
+
+def list_directories(roots):
+    for root in roots:
+        for folder, _, _ in os.walk(root):
+            yield folder
+
+
+def changes_to_targets(changed, known_dirs):
+    """
+    Cartelle modificate -> bersagli (cartella, ricorsivo) per LibraryScanner.update:
+    una cartella sparita (eliminata o spostata) va ripulita ricorsivamente, una esistente
+    si rilegge da sola più le sottocartelle nuove (copiate o spostate lì dentro) per intero.
+    """
+    targets = []
+    for folder in changed:
+        if not os.path.isdir(folder):
+            targets.append((folder, True))
+            continue
+        targets.append((folder, False))
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and entry.path not in known_dirs:
+                        targets.append((entry.path, True))
+        except OSError:
+            pass
+    return targets
+
+
+class PollingWatcher:
+    """
+    Alternativa a inotify per i mount di rete (e controllo lento delle modifiche sul posto nei
+    dischi locali): rilegge periodicamente le cartelle e confronta l'istantanea (mtime/dimensione
+    di video e .nfo per cartella) con la precedente.
+    """
+
+    def __init__(self, roots):
+        self.roots = [os.path.abspath(r) for r in roots]
+        self._snapshot = self._take()
+
+    @property
+    def directories(self):
+        return set(self._snapshot)
+
+    def _take(self):
+        snapshot = {}
+        stack = list(self.roots)
+        while stack:
+            folder = stack.pop()
+            files = {}
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in WATCHED_EXTENSIONS:
+                            try:
+                                st = entry.stat()
+                            except OSError:
+                                continue
+                            files[entry.name] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+            snapshot[folder] = files
+        return snapshot
+
+    def poll(self):
+        """Ritorna i bersagli (cartella, ricorsivo) cambiati dall'ultima chiamata."""
+        old = self._snapshot
+        self._snapshot = self._take()
+        changed = {d for d in old.keys() | self._snapshot.keys() if old.get(d) != self._snapshot.get(d)}
+        return changes_to_targets(changed, old.keys())